@@ -10,27 +10,80 @@ values).
 import re
 import sys
 
+# the value list of an attribute whose values are numbers, in the attributes file
+NUMERIC = 'numeric'
 
-class Attribute:
-    'A single attribute description: name + permissible values'
 
-    def __init__(self, name, values):
+class Attribute(object):
+    """
+    A single attribute description: name + permissible values. The values are kept in one canonical (sorted) order
+    that never changes, and a value's code is its position in that order.
+
+    A numeric attribute has no list of values: any number is permissible. A tree splits it in two at a threshold
+    (see threshold_split)
+    """
+
+    __slots__ = ('name', 'values', 'codes', 'numeric', 'threshold')
+
+    def __init__(self, name, values, numeric=False, threshold=None):
+        """
+        :param name: (str) name of the attribute
+        :param values: ([str, ...]) the permissible values, empty for a numeric attribute
+        :param numeric: (boolean) the values are numbers
+        :param threshold: (float) for the split of a numeric attribute, the largest number on the first side
+        """
         self.name = name
-        self.values = values
+        self.values = tuple(sorted(values))
+        # value -> code
+        self.codes = dict((value, code) for code, value in enumerate(self.values))
+        self.numeric = numeric
+        self.threshold = threshold
 
     def __str__(self):
-        return self.name + ' --> ' + str(self.values)
+        if self.numeric:
+            return self.name + ' --> ' + NUMERIC
+        return self.name + ' --> ' + str(list(self.values))
+
+
+def threshold_split(name, threshold):
+    """
+    :param name: (str) name of a numeric attribute
+    :param threshold: (float) where to split it
+    :return:
+    (Attribute) the two sides of the split as values: '<=threshold' then '>threshold'
+    """
+    return Attribute(name, ['<=' + repr(threshold), '>' + repr(threshold)], threshold=threshold)
 
 
-class Attributes:
-    """An ordered collection of attributes and values"""
+def to_number(value):
+    """
+    :param value: (str or float) the value of a numeric attribute
+    :return:
+    (float) the number, None if the value is not a number
+    """
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    # NaN cannot be ordered
+    return number if number == number else None
+
+
+class Attributes(object):
+    """An ordered collection of attributes and values, indexed by name"""
+
+    __slots__ = ('attributes', 'positions')
 
     # Create a new instance of an attribute collection. If a file is
     # specified, use it to initialize the collection from that file.
     # The expected file format is:
     # attr-name:value[,value]...
+    # or, for an attribute whose values are numbers:
+    # attr-name:numeric
     def __init__(self, attribute_file=False):
         self.attributes = []
+        # name -> index in self.attributes
+        self.positions = {}
         if attribute_file:
             line_num = 1
             for next_line in attribute_file:
@@ -41,8 +94,11 @@ class Attributes:
                     sys.exit(1)
                 name = valid_line.group(1)
                 values = valid_line.group(2).split(',')
-                new_attr = Attribute(name, values)
-                self.attributes.append(new_attr)
+                if values == [NUMERIC]:
+                    new_attr = Attribute(name, [], numeric=True)
+                else:
+                    new_attr = Attribute(name, values)
+                self.append(new_attr)
                 line_num += 1
 
     # Implement the [] operator. If an index is specified, return the
@@ -55,9 +111,9 @@ class Attributes:
         if isinstance(key, int):
           return self.attributes[key]
         elif isinstance(key, str):
-          for attr in self.attributes:
-            if attr.name == key:
-              return attr
+          ndx = self.position(key)
+          if ndx is not None:
+            return self.attributes[ndx]
           sys.stderr.write("Erroneous call to __getitem__\n")
           sys.exit(1)
 
@@ -74,8 +130,26 @@ class Attributes:
     def __copy__(self):
         new_instance = Attributes()
         new_instance.attributes = self.attributes[:]
+        new_instance.positions = self.positions.copy()
         return new_instance
 
+    def append(self, attr):
+        if attr.name not in self.positions:
+            self.positions[attr.name] = len(self.attributes)
+        self.attributes.append(attr)
+
+    # Find the index of the (first) attribute with the specified name, or None
+    # if there is none. The index by name is rebuilt if self.attributes was
+    # changed directly.
+    def position(self, name):
+        ndx = self.positions.get(name)
+        if ndx is None or ndx >= len(self.attributes) or self.attributes[ndx].name != name:
+            self.positions = {}
+            for ndx in reversed(range(len(self.attributes))):
+                self.positions[self.attributes[ndx].name] = ndx
+            ndx = self.positions.get(name)
+        return ndx
+
     def all_names(self):
         return [attr.name for attr in self.attributes]
 
@@ -88,4 +162,5 @@ class Attributes:
                     self.attributes.remove(attr)
         else:
             self.attributes.remove(key)
+        self.positions = {}
 
@@ -0,0 +1,11 @@
+"""
+File:           benchmark/__init__.py
+
+Description:
+Scaling benchmarks for the decision tree. generate writes seeded synthetic data sets in the attributes/CSV format of
+tests/, and run times loading, training, testing and dumping on them (and on the data sets of tests/), recording the
+peak memory of each case.
+
+Run from the top of the repository:
+    python -m benchmark.run --rows 1000 10000 --attributes 5 50 --arity 2 10 --output results.json
+"""
@@ -0,0 +1,106 @@
+"""
+File:           benchmark/generate.py
+
+Description:
+Seeded synthetic data sets in the format of the files in tests/: an attributes file (one "name:value,value,..." line
+per attribute, the classifier last) and CSV data files with one example per line.
+
+Attribute aN takes the values v0 ... v(arity-1), uniformly at random. The class is decided by the first few
+(informative) attributes: every value of an informative attribute carries a random score, and an example is 'yes'
+when the scores of its values add up to more than zero. A fraction of the labels (noise) are then replaced by a random
+class. The same arguments always give the same files.
+"""
+
+import os
+import random
+
+CLASSIFIER = 'class'
+CLASSES = ('yes', 'no')
+# rows written to a file at a time
+CHUNK_SIZE = 10000
+
+
+def attribute_names(num_attributes):
+    """
+    :param num_attributes: (int) number of attributes, not counting the classifier
+    :return:
+    ([str, ...]) the names of the attributes
+    """
+    return ['a%d' % ndx for ndx in range(num_attributes)]
+
+
+def write_attributes(path, num_attributes, arity):
+    """
+    Writes an attributes file
+
+    :param path: (str) path of the file to write
+    :param num_attributes: (int) number of attributes, not counting the classifier
+    :param arity: (int) number of values of every attribute
+    """
+    values = ','.join('v%d' % code for code in range(arity))
+    with open(path, 'w') as attributes_file:
+        for name in attribute_names(num_attributes):
+            attributes_file.write('%s:%s\n' % (name, values))
+        attributes_file.write('%s:%s\n' % (CLASSIFIER, ','.join(CLASSES)))
+
+
+def write_examples(path, rows, num_attributes, arity, scores, noise, rng):
+    """
+    Writes a data file of random examples
+
+    :param path: (str) path of the file to write
+    :param rows: (int) number of examples
+    :param num_attributes: (int) number of attributes, not counting the classifier
+    :param arity: (int) number of values of every attribute
+    :param scores: ([[float, ...], ...]) score of every value of each informative attribute
+    :param noise: (float) fraction of the examples whose class is replaced by a random one
+    :param rng: (random.Random) source of the examples
+    """
+    values = ['v%d' % code for code in range(arity)]
+    informative = range(len(scores))
+    with open(path, 'w') as data_file:
+        written = 0
+        while written < rows:
+            lines = list()
+            for _ in range(min(CHUNK_SIZE, rows - written)):
+                codes = [int(rng.random() * arity) for _ in range(num_attributes)]
+                label = CLASSES[0] if sum(scores[ndx][codes[ndx]] for ndx in informative) > 0 else CLASSES[1]
+                if noise and rng.random() < noise:
+                    label = rng.choice(CLASSES)
+                lines.append(','.join([values[code] for code in codes] + [label]) + '\n')
+            data_file.writelines(lines)
+            written += len(lines)
+
+
+def generate(directory, rows, num_attributes, arity, noise=0.0, seed=0, test_rows=None, informative=8):
+    """
+    Writes a synthetic data set, unless the same one was written before
+
+    :param directory: (str) directory to write the files to
+    :param rows: (int) number of training examples
+    :param num_attributes: (int) number of attributes, not counting the classifier
+    :param arity: (int) number of values of every attribute
+    :param noise: (float) fraction of the examples whose class is replaced by a random one
+    :param seed: (int) seed of the random numbers
+    :param test_rows: (int) number of testing examples, a quarter of rows if None
+    :param informative: (int) number of attributes that decide the class
+    :return:
+    (str, str, str) paths of the attributes file, the training file and the testing file
+    """
+    if test_rows is None:
+        test_rows = max(1, rows // 4)
+    prefix = os.path.join(directory, 'synthetic-r%d-t%d-a%d-i%d-v%d-n%g-s%d' %
+                          (rows, test_rows, num_attributes, informative, arity, noise, seed))
+    paths = prefix + '-attributes.txt', prefix + '-train.csv', prefix + '-test.csv'
+    if all(os.path.exists(path) for path in paths):
+        return paths
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    rng = random.Random(3 * seed)
+    scores = [[rng.random() - 0.5 for _ in range(arity)] for _ in range(min(informative, num_attributes))]
+    write_attributes(paths[0], num_attributes, arity)
+    # the testing file comes from a stream of its own, so it does not depend on the number of training rows
+    write_examples(paths[1], rows, num_attributes, arity, scores, noise, random.Random(3 * seed + 1))
+    write_examples(paths[2], test_rows, num_attributes, arity, scores, noise, random.Random(3 * seed + 2))
+    return paths
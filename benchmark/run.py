@@ -0,0 +1,249 @@
+"""
+File:           benchmark/run.py
+
+Description:
+Times the stages of the decision tree separately (loading the data files, building the tree, testing it and dumping
+it) on the data sets of tests/ and on a grid of synthetic data sets (see generate), and writes the measurements to a
+JSON file. Every case runs in a process of its own, so the peak resident set size recorded for it is its own.
+
+Given the results of an earlier run (--baseline), each stage is compared with it, and the exit status is 1 if any
+stage got slower than the tolerance allows.
+
+Run from the top of the repository:
+    python -m benchmark.run --rows 1000 100000 --attributes 5 100 --arity 2 20 --noise 0 0.1
+"""
+
+import argparse
+import copy
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import attributes
+import dataset
+import id3
+from benchmark import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS_DIR = os.path.join(ROOT, 'tests')
+STAGES = ('load_seconds', 'build_seconds', 'test_seconds', 'dump_seconds')
+
+
+def peak_rss():
+    """
+    :return:
+    (int) the peak resident set size of this process so far, in kilobytes
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+
+def reference_cases():
+    """
+    The data sets of tests/, classified by the last attribute of their attributes file as in run_tests.sh. Data sets
+    without a testing file are tested on their training file
+
+    :return:
+    ([dict, ...]) a case for each data set
+    """
+    cases = list()
+    for filename in sorted(os.listdir(TESTS_DIR)):
+        if not filename.endswith('-attributes.txt'):
+            continue
+        prefix = os.path.join(TESTS_DIR, filename[:-len('-attributes.txt')])
+        if not os.path.exists(prefix + '-train.csv'):
+            continue
+        with open(prefix + '-attributes.txt') as attributes_file:
+            classifier = attributes.Attributes(attributes_file).attributes[-1].name
+        test = prefix + '-test.csv' if os.path.exists(prefix + '-test.csv') else prefix + '-train.csv'
+        cases.append({'name': 'tests/' + os.path.basename(prefix), 'attributes': prefix + '-attributes.txt',
+                      'train': prefix + '-train.csv', 'test': test, 'classifier': classifier})
+    return cases
+
+
+def synthetic_cases(args):
+    """
+    Generates the synthetic data sets of the grid given on the command line, if they do not exist yet
+
+    :param args: (argparse.Namespace) the command line
+    :return:
+    ([dict, ...]) a case for each data set
+    """
+    cases = list()
+    for rows, num_attributes, arity, noise in itertools.product(args.rows, args.attributes, args.arity, args.noise):
+        paths = generate.generate(args.data_dir, rows, num_attributes, arity, noise, args.seed,
+                                  informative=args.informative)
+        cases.append({'name': os.path.basename(paths[0])[:-len('-attributes.txt')], 'attributes': paths[0],
+                      'train': paths[1], 'test': paths[2], 'classifier': generate.CLASSIFIER, 'rows': rows,
+                      'num_attributes': num_attributes, 'arity': arity, 'noise': noise, 'seed': args.seed})
+    return cases
+
+
+def run_case(case, jobs=1):
+    """
+    Measures one case in this process
+
+    :param case: (dict) paths of the attributes, training and testing files, and the name of the classifier
+    :param jobs: (int) number of processes that evaluate candidate splits
+    :return:
+    (dict) the case with the time of every stage, the size and accuracy of the tree, and the peak resident set size
+    """
+    with open(case['attributes']) as attributes_file:
+        all_attributes = attributes.Attributes(attributes_file)
+    classifier = all_attributes[str(case['classifier'])]
+    starting_attrs = copy.copy(all_attributes)
+    starting_attrs.remove(classifier)
+
+    start = time.time()
+    with open(case['train']) as training_file:
+        training_data = dataset.EncodedDataSet(training_file, all_attributes)
+    with open(case['test']) as testing_file:
+        testing_data = dataset.EncodedDataSet(testing_file, all_attributes)
+    load_seconds = time.time() - start
+
+    start = time.time()
+    dtree = id3.DTree(classifier, training_data, starting_attrs, jobs=jobs)
+    build_seconds = time.time() - start
+
+    start = time.time()
+    correct = dtree.test(classifier, testing_data)
+    test_seconds = time.time() - start
+
+    start = time.time()
+    with open(os.devnull, 'w') as dump_file:
+        dtree.write_dump(dump_file)
+    dump_seconds = time.time() - start
+
+    result = dict(case)
+    result.update({'jobs': jobs, 'train_examples': len(training_data), 'test_examples': len(testing_data),
+                   'load_seconds': load_seconds, 'build_seconds': build_seconds, 'test_seconds': test_seconds,
+                   'dump_seconds': dump_seconds, 'nodes': len(dtree.compile()),
+                   'accuracy': float(correct) / len(testing_data) if len(testing_data) else None,
+                   'peak_rss_kb': peak_rss()})
+    return result
+
+
+def spawn_case(case, jobs):
+    """
+    Measures one case in a new process
+
+    :param case: (dict) the case (see run_case)
+    :param jobs: (int) number of processes that evaluate candidate splits
+    :return:
+    (dict) the measurements, or the case with the exit status of the process if it failed
+    """
+    command = [sys.executable, '-m', 'benchmark.run', '--case', json.dumps(case), '--jobs', str(jobs)]
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE)
+    output = process.communicate()[0]
+    if process.returncode != 0:
+        result = dict(case)
+        result['error'] = process.returncode
+        return result
+    return json.loads(output.splitlines()[-1])
+
+
+def git_commit():
+    """
+    :return:
+    (str) the commit the repository is at, None if it cannot be told
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, stderr=open(os.devnull, 'w')).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints the time of every stage relative to an earlier run
+
+    :param results: ([dict, ...]) the measurements of this run
+    :param baseline: ([dict, ...]) the measurements of the earlier run
+    :param tolerance: (float) how much slower (0.2 for 20%) a stage may get before it counts as a regression
+    :return:
+    (int) the number of regressions
+    """
+    earlier = dict((result['name'], result) for result in baseline)
+    regressions = 0
+    for result in results:
+        before = earlier.get(result['name'])
+        if before is None or 'error' in result or 'error' in before:
+            continue
+        ratios = list()
+        for stage in STAGES:
+            ratio = result[stage] / before[stage] if before[stage] else 1.0
+            flag = ''
+            if ratio > 1.0 + tolerance:
+                flag = ' SLOWER'
+                regressions += 1
+            ratios.append('%s %.2fx%s' % (stage[:-len('_seconds')], ratio, flag))
+        print '%s: %s' % (result['name'], ', '.join(ratios))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the decision tree on reference and synthetic data sets')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Numbers of training examples of the synthetic data sets')
+    parser.add_argument('--attributes', type=int, nargs='+', default=[5, 50],
+                        help='Numbers of attributes of the synthetic data sets')
+    parser.add_argument('--arity', type=int, nargs='+', default=[2, 10],
+                        help='Numbers of values of each attribute of the synthetic data sets')
+    parser.add_argument('--noise', type=float, nargs='+', default=[0.0],
+                        help='Fractions of the synthetic examples whose class is random')
+    parser.add_argument('--informative', type=int, default=8,
+                        help='Number of attributes that decide the class of the synthetic examples')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the synthetic data sets')
+    parser.add_argument('--no-reference', action='store_true', dest='no_reference',
+                        help='Skip the data sets of tests/')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Number of processes that evaluate candidate splits. With more than 1, the examples are '
+                             'counted row by row in the workers, never as bitsets')
+    parser.add_argument('--data-dir', dest='data_dir', default='benchmark-data',
+                        help='Directory the synthetic data sets are generated in, and reused from')
+    parser.add_argument('--output', default='benchmark-results.json',
+                        help='File to write the results to')
+    parser.add_argument('--baseline', type=argparse.FileType('r'),
+                        help='Results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='How much slower a stage may get than in the baseline before it counts as a regression')
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print json.dumps(run_case(json.loads(args.case), args.jobs))
+        return
+
+    args.data_dir = os.path.abspath(args.data_dir)
+    cases = list() if args.no_reference else reference_cases()
+    cases.extend(synthetic_cases(args))
+
+    results = list()
+    for case in cases:
+        sys.stderr.write('%s...' % case['name'])
+        result = spawn_case(case, args.jobs)
+        if 'error' in result:
+            sys.stderr.write('FAILED (exit status %d)\n' % result['error'])
+        else:
+            sys.stderr.write('%.2fs, %d KB\n' % (sum(result[stage] for stage in STAGES), result['peak_rss_kb']))
+        results.append(result)
+
+    with open(args.output, 'w') as output_file:
+        json.dump({'commit': git_commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+                   'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results},
+                  output_file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        if compare(results, json.load(args.baseline)['results'], args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
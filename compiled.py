@@ -0,0 +1,327 @@
+"""
+File:           compiled.py
+
+Description:
+A trained decision tree flattened into parallel arrays, for classifying whole batches of examples
+
+Every node of the tree gets an index (the root is node 0, and the nodes are numbered level by level).
+For node n:
+- split[n] is the column of the attribute it splits on, or -1 if n is a leaf
+- label[n] is the code of the class a leaf predicts, or -1 if n is not a leaf
+- children[first_child[n] + code] is the child that examples with value `code` of the split attribute go to
+- for the split of a numeric attribute, children[first_child[n]] is the child of the examples whose number is at most
+  threshold[n], and children[first_child[n] + 1] the child of the others
+
+Columns and codes are those of the tree's schema (see dataset.EncodedStore).
+
+A compiled tree is also the saved form of a model (see write and read): a prefix (magic, format version, header
+length), a JSON header with the schema (its names and values decoded as Latin-1, whatever their encoding), then the
+four arrays as little-endian 32-bit integers and the thresholds as little-endian doubles (from version 2 on).
+"""
+
+import json
+import struct
+import sys
+from array import array
+
+import dataset
+from attributes import Attribute, Attributes, threshold_split
+from node import Node
+
+MODEL_MAGIC = 'ID3MODEL'
+MODEL_VERSION = 2
+MODEL_PREFIX = struct.Struct('<8sHI')
+
+
+class CompiledTree(object):
+    """A decision tree stored as flat arrays"""
+
+    def __init__(self, schema, classifier, split, label, first_child, children, threshold=None):
+        """
+        :param schema: (Attributes) the attributes in column order, with their values in code order
+        :param classifier: (str) name of the attribute being classified
+        :param split: (array('i')) column each node splits on, -1 for a leaf
+        :param label: (array('i')) class code each leaf predicts, -1 for a split
+        :param first_child: (array('I')) position of each node's child table in children
+        :param children: (array('I')) the child tables
+        :param threshold: (array('d')) threshold of each split of a numeric attribute, 0 for the other nodes. None
+                                        for all 0 (a model saved before numeric attributes)
+        """
+        self.store = dataset.EncodedStore(schema)
+        self.classifier = classifier
+        self.classes = self.store.values[self.store.column(classifier)]
+        self.split = split
+        self.label = label
+        self.first_child = first_child
+        self.children = children
+        self.threshold = threshold if threshold is not None else array('d', [0.0]) * len(split)
+        # (columns, tables, numeric nodes) of routes, by the schema of the store they were built for
+        self.route_cache = dict()
+
+    @staticmethod
+    def from_tree(root, schema, classifier):
+        """
+        Flattens a tree of Nodes
+
+        :param root: (Node) the root of a trained decision tree
+        :param schema: (Attributes) the attributes in column order, with their values in the order the codes should
+                                    follow
+        :param classifier: (str) name of the attribute being classified
+        :return:
+        (CompiledTree) the flattened tree
+        """
+        compiled = CompiledTree(schema, classifier, array('i'), array('i'), array('I'), array('I'), array('d'))
+        store = compiled.store
+
+        # number the nodes level by level
+        nodes = [root]
+        for node in nodes:
+            if 'end' not in node.attribute.values:
+                nodes.extend(child for _, child in node.children)
+        number = dict((id(node), ndx) for ndx, node in enumerate(nodes))
+
+        for node in nodes:
+            compiled.first_child.append(len(compiled.children))
+            compiled.threshold.append(node.attribute.threshold or 0.0)
+            if 'end' in node.attribute.values:
+                compiled.split.append(-1)
+                compiled.label.append(compiled.classes.index(node.attribute.name))
+                continue
+
+            column = store.column(node.attribute)
+            compiled.split.append(column)
+            compiled.label.append(-1)
+            if node.attribute.threshold is not None:
+                # the side at most the threshold, then the other one
+                compiled.children.extend(number[id(child)] for _, child in node.children)
+                continue
+            by_code = [0] * len(store.values[column])
+            for value, child in node.children:
+                by_code[store.codes_of[column][value]] = number[id(child)]
+            compiled.children.extend(by_code)
+        return compiled
+
+    def to_tree(self, schema=None):
+        """
+        Rebuilds the tree of Nodes, without any examples. Internal nodes share one Attribute per column, and their
+        children follow the code order of the values
+
+        :param schema: (Attributes) the Attribute objects the nodes should use, a copy of the tree's schema if None
+        :return:
+        (Node) the root of the tree
+        """
+        if schema is None:
+            schema = self.store.schema()
+        nodes = list()
+        for node in range(len(self.split)):
+            column = self.split[node]
+            if column < 0:
+                attribute = Attribute(self.classes[self.label[node]], ['end'])
+            elif schema.attributes[column].numeric:
+                attribute = threshold_split(schema.attributes[column].name, self.threshold[node])
+            else:
+                attribute = schema.attributes[column]
+            nodes.append(Node(data=None, parent=None, children=list(), attribute=attribute))
+
+        for node, parent in enumerate(nodes):
+            column = self.split[node]
+            if column < 0:
+                continue
+            first = self.first_child[node]
+            if parent.attribute.threshold is not None:
+                values = parent.attribute.values
+            else:
+                values = self.store.values[column]
+            for code, value in enumerate(values):
+                child = nodes[self.children[first + code]]
+                child.parent = parent
+                parent.children.append((value, child))
+        return nodes[0]
+
+    def __len__(self):
+        return len(self.split)
+
+    def encode(self, data):
+        """
+        :param data: (DataSet) examples to classify
+        :return:
+        (EncodedDataSet) the examples, integer-encoded. Encoded data sets are used as they are, whatever their codes
+        """
+        if isinstance(data, dataset.EncodedDataSet):
+            return data
+        return data.encode(self.store.schema())
+
+    def routes(self, store):
+        """
+        Child tables of every internal node, indexed directly by the codes of another store, or by its rows for the
+        splits of numeric attributes. The tables of categorical attributes only depend on the store's schema, and are
+        built once per schema; those of numeric attributes read the numbers of the store, and are built on every call
+
+        :param store: (EncodedStore) the store that holds the examples to classify
+        :return:
+        ([int, ...], [[int, ...], ...]) for each node, the column of its split attribute in the given store and the
+                                        table value code -> child (row -> child for a _ThresholdTable)
+        """
+        key = (tuple(store.names), tuple(store.values))
+        if key not in self.route_cache:
+            self.route_cache[key] = self.categorical_routes(store)
+        columns, tables, numeric_nodes = self.route_cache[key]
+        if numeric_nodes:
+            tables = list(tables)
+            for node in numeric_nodes:
+                first = self.first_child[node]
+                tables[node] = _ThresholdTable(store.numbers[columns[node]], self.threshold[node],
+                                               self.children[first], self.children[first + 1])
+        return columns, tables
+
+    def categorical_routes(self, store):
+        """
+        :param store: (EncodedStore) the store that holds the examples to classify
+        :return:
+        ([int, ...], [[int, ...], ...], [int, ...]) as routes, with None for the table of every split of a numeric
+                                                    attribute, and those nodes
+        """
+        columns = list()
+        tables = list()
+        numeric_nodes = list()
+        for node in range(len(self.split)):
+            column = self.split[node]
+            if column < 0:
+                columns.append(-1)
+                tables.append(None)
+                continue
+            name = self.store.names[column]
+            first = self.first_child[node]
+            codes = self.store.codes_of[column]
+            source = store.column(name)
+            columns.append(source)
+            if column in self.store.numeric_columns:
+                tables.append(None)
+                numeric_nodes.append(node)
+            else:
+                tables.append([self.children[first + codes[value]] for value in store.values[source]])
+        return columns, tables, numeric_nodes
+
+    def predict_leaves(self, data):
+        """
+        Routes a batch of examples through the tree one level at a time
+
+        :param data: (EncodedDataSet) the examples to classify
+        :return:
+        ([int, ...]) the leaf each example ends up in
+        """
+        columns, tables = self.routes(data.store)
+        codes = data.store.codes
+        rows = data.row_indices()
+        offsets = [row * data.store.width for row in rows]
+        # the nodes whose table is indexed by row
+        by_row = [isinstance(table, _ThresholdTable) for table in tables]
+        numeric = any(by_row)
+
+        position = [0] * len(offsets)
+        active = range(len(offsets)) if columns[0] >= 0 else []
+        while active:
+            # move every example that is still at an internal node down one level
+            if numeric:
+                for ndx in active:
+                    node = position[ndx]
+                    if by_row[node]:
+                        position[ndx] = tables[node][rows[ndx]]
+                    else:
+                        position[ndx] = tables[node][codes[offsets[ndx] + columns[node]]]
+            else:
+                for ndx in active:
+                    node = position[ndx]
+                    position[ndx] = tables[node][codes[offsets[ndx] + columns[node]]]
+            active = [ndx for ndx in active if columns[position[ndx]] >= 0]
+        return position
+
+    def predict_batch(self, data):
+        """
+        Classifies a batch of examples
+
+        :param data: (DataSet) the examples to classify
+        :return:
+        ([str, ...]) the predicted class of each example, in order
+        """
+        classes = self.classes
+        label = self.label
+        return [classes[label[leaf]] for leaf in self.predict_leaves(self.encode(data))]
+
+    def write(self, model_file):
+        """
+        Saves the tree
+
+        :param model_file: (file) binary file to write to
+        """
+        header = json.dumps({'classifier': self.classifier, 'names': self.store.names, 'values': self.store.values,
+                             'numeric': self.store.numeric_columns, 'nodes': len(self.split),
+                             'children': len(self.children)}, encoding=dataset.JSON_ENCODING)
+        model_file.write(MODEL_PREFIX.pack(MODEL_MAGIC, MODEL_VERSION, len(header)))
+        model_file.write(header)
+        for table in (self.split, self.label, self.first_child, self.children, self.threshold):
+            if sys.byteorder != 'little':
+                table = array(table.typecode, table)
+                table.byteswap()
+            table.tofile(model_file)
+
+    @staticmethod
+    def read(model_file):
+        """
+        Loads a tree saved by write
+
+        :param model_file: (file) binary file to read from
+        :return:
+        (CompiledTree) the tree
+        """
+        magic, version, header_size = MODEL_PREFIX.unpack(model_file.read(MODEL_PREFIX.size))
+        if magic != MODEL_MAGIC:
+            sys.stderr.write("%s: not a decision tree model\n" % model_file.name)
+            sys.exit(1)
+        if version not in (1, MODEL_VERSION):
+            sys.stderr.write("%s: unsupported model version %d\n" % (model_file.name, version))
+            sys.exit(1)
+        header = json.loads(model_file.read(header_size))
+
+        # json gives back unicode: the names and values are the bytes they were written from (see write)
+        schema = Attributes()
+        numeric = header.get('numeric', [])
+        for column, (name, values) in enumerate(zip(header['names'], header['values'])):
+            name = name.encode(dataset.JSON_ENCODING)
+            if column in numeric:
+                schema.append(Attribute(name, [], numeric=True))
+            else:
+                schema.append(Attribute(name, [value.encode(dataset.JSON_ENCODING) for value in values]))
+        tables = list()
+        sizes = [('i', header['nodes']), ('i', header['nodes']), ('I', header['nodes']), ('I', header['children'])]
+        if version > 1:
+            # the thresholds came with numeric attributes
+            sizes.append(('d', header['nodes']))
+        for typecode, size in sizes:
+            table = array(typecode)
+            table.fromfile(model_file, size)
+            if sys.byteorder != 'little':
+                table.byteswap()
+            tables.append(table)
+        return CompiledTree(schema, header['classifier'].encode(dataset.JSON_ENCODING), *tables)
+
+
+class _ThresholdTable(object):
+    """The child table of the split of a numeric attribute, indexed by the rows of a store"""
+
+    __slots__ = ('numbers', 'threshold', 'below', 'above')
+
+    def __init__(self, numbers, threshold, below, above):
+        """
+        :param numbers: (sequence of float) the numbers of the attribute in a store, row after row
+        :param threshold: (float) the largest number that goes to the first child
+        :param below: (int) the first child
+        :param above: (int) the second child
+        """
+        self.numbers = numbers
+        self.threshold = threshold
+        self.below = below
+        self.above = above
+
+    def __getitem__(self, row):
+        return self.above if self.numbers[row] > self.threshold else self.below
@@ -4,16 +4,70 @@ File:           dataset.py
 Specifies an interface for storing individual datapoints (class Example), and collections
 of datapoints (class DataSet). A DataSet can be initialized from a data file in the format
 described in section 1.
+
+A DataSet can also be kept integer-encoded (class EncodedDataSet): every value is replaced by
+its small integer code in the attribute's list of values, and all the rows live in one contiguous
+row-major array (class EncodedStore) that any number of DataSets can view by row index.
+
+The rows of a store of mostly binary attributes can also be viewed as bitsets (classes BitsetIndex and
+BitsetDataSet), counted with ANDs and popcounts instead of one row at a time.
 """
+import copy
+import ctypes
+import hashlib
+import json
+import mmap
+import os
 import re
+import struct
 import sys
+from array import array
 from math import log
 
+from attributes import Attribute, Attributes, threshold_split, to_number
+
+
+class AttributeLayout(object):
+    """
+    The attributes of the examples of a data file, in their column order, frozen when the file is read: the examples
+    keep their columns when the Attributes they were read with change later (an attribute removed, for instance)
+    """
+
+    __slots__ = ('attributes', 'positions')
+
+    def __init__(self, attributes):
+        """
+        :param attributes: (Attributes) the attributes of each example, in column order
+        """
+        self.attributes = tuple(attributes.attributes)
+        # name -> column, the first column of the name
+        self.positions = dict()
+        for ndx, attr in enumerate(self.attributes):
+            self.positions.setdefault(attr.name, ndx)
+
+    def __len__(self):
+        return len(self.attributes)
+
+    def position(self, name):
+        """
+        :param name: (str) name of an attribute
+        :return:
+        (int) the column of the attribute, None if there is none
+        """
+        return self.positions.get(name)
 
-class Example:
-    """An individual example with values for each attribute"""
+
+class Example(object):
+    """
+    An individual example with values for each attribute, stored as a tuple of value codes (see Attribute.codes) in
+    the order of its attributes. The value of a numeric attribute is stored as the number itself
+    """
+
+    __slots__ = ('schema', 'codes')
 
     def __init__(self, values, attributes, filename, line_num):
+        if not isinstance(attributes, AttributeLayout):
+            attributes = AttributeLayout(attributes)
         if len(values) != len(attributes):
           sys.stderr.write(
             "%s: %d: Incorrect number of attributes (saw %d, expected %d)\n" %
@@ -21,23 +75,48 @@ class Example:
           sys.exit(1)
         # Add values, Verifying that they are in the known domains for each
         # attribute
-        self.values = {}
-        for ndx in range(len(attributes)):
-            value = values[ndx]
-            attr = attributes.attributes[ndx]
-            if value not in attr.values:
-                sys.stderr.write("%s: %d: Value %s not in known values %s for attribute %s\n" %
-                                 (filename, line_num, value, attr.values, attr.name))
-                sys.exit(1)
-            self.values[attr.name] = value
+        try:
+            self.codes = tuple([attr.codes[value] for attr, value in zip(attributes.attributes, values)])
+        except KeyError:
+            codes = list()
+            for ndx in range(len(attributes)):
+                value = values[ndx]
+                attr = attributes.attributes[ndx]
+                if attr.numeric:
+                    number = to_number(value)
+                    if number is None:
+                        sys.stderr.write("%s: %d: Value %s is not a number for attribute %s\n" %
+                                         (filename, line_num, value, attr.name))
+                        sys.exit(1)
+                    codes.append(number)
+                elif value not in attr.codes:
+                    sys.stderr.write("%s: %d: Value %s not in known values %s for attribute %s\n" %
+                                     (filename, line_num, value, list(attr.values), attr.name))
+                    sys.exit(1)
+                else:
+                    codes.append(attr.codes[value])
+            self.codes = tuple(codes)
+        # the layout is shared by every example of a data file
+        self.schema = attributes
+
+    @property
+    def values(self):
+        """
+        :return:
+        (dict) attribute name -> value
+        """
+        return dict((attr.name, code if attr.numeric else attr.values[code])
+                    for attr, code in zip(self.schema.attributes, self.codes))
 
     # Find a value for the specified attribute, which may be specified as
     # an Attribute instance, or an attribute name.
     def get_value(self, attr):
-        if isinstance(attr, str):
-            return self.values[attr]
-        else:
-            return self.values[attr.name]
+        ndx = self.schema.position(attr if isinstance(attr, str) else attr.name)
+        if ndx is None:
+            raise KeyError(attr if isinstance(attr, str) else attr.name)
+        if self.schema.attributes[ndx].numeric:
+            return self.codes[ndx]
+        return self.schema.attributes[ndx].values[self.codes[ndx]]
     
 
 class DataSet:
@@ -48,11 +127,12 @@ class DataSet:
         if data_file:
             line_num = 1
             num_attrs = len(attributes)
+            layout = AttributeLayout(attributes)
             for next_line in data_file:
                 next_line = next_line.rstrip()
                 next_line = re.sub(".*:(.*)$", "\\1", next_line)
                 attr_values = next_line.split(',')
-                new_example = Example(attr_values, attributes, data_file.name, line_num)
+                new_example = Example(attr_values, layout, data_file.name, line_num)
                 self.all_examples.append(new_example)
                 line_num += 1
 
@@ -65,6 +145,146 @@ class DataSet:
     def append(self, example):
         self.all_examples.append(example)
 
+    def values_of(self, attr):
+        """
+        :param attr: (Attribute or str) an attribute, or an attribute's name
+        :return:
+        ([str, ...]) the value of the attribute for every example, in order
+        """
+        return [example.get_value(attr) for example in self.all_examples]
+
+    def encode(self, attributes):
+        """
+        Integer-encode the examples of this data set
+
+        :param attributes: (Attributes) every attribute that should be stored, classifier included
+        :return:
+        (EncodedDataSet) a data set with the same examples, in the same order
+        """
+        encoded = EncodedDataSet(attributes=attributes)
+        encoded.store.add(self)
+        return encoded
+
+    def class_counts(self, classifier):
+        """
+        Count how many examples fall into each value of the classifier in a single pass
+
+        :param classifier: (Attribute) the attribute to classify the examples
+        :return:
+        (dict) value -> number of examples with that value
+        """
+        counts = dict()
+        name = classifier.name
+        for example in self.all_examples:
+            value = example.get_value(name)
+            counts[value] = counts.get(value, 0) + 1
+        return counts
+
+    def contingency(self, target_attr, attrs):
+        """
+        Build the attribute x value x class count table for every attribute in a single pass
+        over the examples
+
+        :param target_attr: (Attribute) attribute to classify based on
+        :param attrs: (Attributes or [Attribute, ...]) the candidate attributes
+        :return:
+        (class_counts, tables)
+        class_counts: (dict) class value -> count
+        tables: (dict) attribute name -> value -> class value -> count
+        """
+        names = [attr.name for attr in attrs]
+        class_counts = dict()
+        tables = dict((name, dict()) for name in names)
+        columns = [(name, tables[name]) for name in names]
+
+        for example in self.all_examples:
+            label = example.get_value(target_attr.name)
+            class_counts[label] = class_counts.get(label, 0) + 1
+            for name, table in columns:
+                value = example.get_value(name)
+                row = table.get(value)
+                if row is None:
+                    row = table[value] = dict()
+                row[label] = row.get(label, 0) + 1
+
+        return class_counts, tables
+
+    @staticmethod
+    def counts_entropy(counts, classifier):
+        """
+        Shannon's entropy of a population described only by its class counts
+        (see DataSet.entropy)
+
+        :param counts: (dict) class value -> count
+        :param classifier: (Attribute) the attribute whose values are being counted
+        :return: (entropy, dominant_value)
+        """
+        h = 0.0
+        # dominant_value = (value, size)
+        dominant_value = None
+
+        population_size = float(sum(counts.values()))
+        if population_size == 0.0:
+            # if there are no examples then all the examples are the same
+            # there is order of nothingness
+            return 0.0, None
+
+        for value in classifier.values:
+            # go through each value in the classifier
+            # if there are examples and none of them are in this value, there is no way this value
+            #       can be the most dominant
+            size = counts.get(value, 0)
+            if size == 0:
+                continue
+
+            # calculation of the partial probability
+            partial_probability = float(float(size)/population_size)
+            h += partial_probability * log(partial_probability, 2)
+
+            # update the dominant value
+            # if there is a new value with a partial population larger than the current dominant value
+            # make this new value the dominant value
+            if dominant_value is None or size > dominant_value[1]:
+                dominant_value = value, size
+
+        return -1 * h, dominant_value[0]
+
+    @staticmethod
+    def table_remainder(table, target_attr, attr, population_size):
+        """
+        The remainder of a population split on an attribute, computed from its count table
+
+        :param table: (dict) value -> class value -> count, for the given attribute
+        :param target_attr: (Attribute) The attribute to classify the nodes on
+        :param attr: (Attribute) The specific attribute
+        :param population_size: (int) number of examples in the population
+        :return:
+        (float) the remainder based on the attribute
+        """
+        return DataSet.split_remainder([table.get(value) for value in attr.values], target_attr, population_size)
+
+    @staticmethod
+    def split_remainder(groups, target_attr, population_size):
+        """
+        The remainder of a population split in groups, computed from the class counts of the groups. Categorical
+        splits (see table_remainder) and the thresholds of numeric attributes (see EncodedDataSet.best_threshold) are
+        both scored with it
+
+        :param groups: ([dict, ...]) class value -> count, for each group (None for an empty group)
+        :param target_attr: (Attribute) The attribute to classify the nodes on
+        :param population_size: (int) number of examples in the population
+        :return:
+        (float) the remainder of the split
+        """
+        total = 0
+        for counts in groups:
+            if not counts:
+                # an empty split has no entropy and no weight
+                continue
+            size = sum(counts.values())
+            total += (float(size)/float(population_size)) * DataSet.counts_entropy(counts, target_attr)[0]
+        return total
+
     def entropy(self, classifier):
         """
         SHANNON'S ENTROPY
@@ -97,49 +317,7 @@ class DataSet:
         dominant_value:
             None: if there are no examples
         """
-        h = 0.0
-        # dominant_value = (value, size)
-        dominant_value = None
-
-        if len(self.all_examples) == 0.0:
-            # if there are no examples then all the examples are the same
-            # there is order of nothingness
-            # print 'no examples'
-            return 0.0, None
-
-        population_size = float(len(self.all_examples))
-
-        # otherwise calculate entropy
-        for value in classifier.values:
-            # go through each value in the classifier
-            # calculate the parts associated with that value
-            # add it to the entropy sum
-            partial_population = [x for x in self.all_examples if x.get_value(classifier.name) == value]
-
-            if len(partial_population) == 0.0:
-                # if this is zero, we just classify it as zero and move on
-                # if there are examples and none of them are in this value, there is no way this value
-                #       can be the most dominant
-                h += 0.0
-                continue
-            else:
-                # calculation of the partial probability
-                partial_probability = float(float(len(partial_population))/population_size)
-                partial_entropy = partial_probability * log(partial_probability, 2)
-                h += partial_entropy
-
-            # update the dominant value
-            if dominant_value is None:
-                # if the dominant value has not been initialized yet
-                # collect the first value and add it to the dominant value
-                dominant_value = value, len(partial_population)
-            else:
-                # if there is a new value with a partial population larger than the current dominant value
-                # make this new value the dominant value
-                if len(partial_population) > dominant_value[1]:
-                    dominant_value = value, len(partial_population)
-
-        return -1 * h, dominant_value[0]
+        return self.counts_entropy(self.class_counts(classifier), classifier)
 
     def remainder(self, target_attr, attr):
         """
@@ -150,19 +328,8 @@ class DataSet:
         :return:
         (int) the remainder based on the attribute
         """
-        total = 0
-        for value in attr.values:
-            # ENTROPY
-            temp = DataSet()
-            temp.all_examples = [x for x in self.all_examples if x.get_value(attr) == value]
-            # WEIGHT
-            num_pos = temp.partial_count(target_attr)
-            val = num_pos + (len(temp)-num_pos)
-            actual = self.partial_count(target_attr) + (self.__len__() - self.partial_count(target_attr))
-
-            total += (float(val)/float(actual)) * temp.entropy(target_attr)[0]
-
-        return total
+        tables = self.contingency(target_attr, [attr])[1]
+        return self.table_remainder(tables[attr.name], target_attr, attr, len(self))
 
     def gain(self, target_attr, attr, debug=False):
         """
@@ -180,14 +347,45 @@ class DataSet:
         :return:
         (int) the gain
         """
-        current_entropy = self.entropy(target_attr)[0]
-        # print
-        # print attr
+        return self.gains(target_attr, [attr], debug)[0][1]
+
+    def gains(self, target_attr, attrs, debug=False):
+        """
+        The information gain of every candidate attribute, evaluated from one contingency
+        table built in a single pass over the examples
+
+        :param target_attr: (Attribute) attribute to classify based on
+        :param attrs: (Attributes or [Attribute, ...]) the candidate attributes
+        :param debug: (Boolean) Enable or disable debug messages
+        :return:
+        ([(Attribute, float), ...]) each attribute with its gain, in the order of attrs
+        """
+        class_counts, tables = self.contingency(target_attr, attrs)
+        return self.table_gains(class_counts, tables, target_attr, attrs, debug)
 
-        gain = current_entropy - self.remainder(target_attr=target_attr, attr=attr)
-        if debug is True:
-            print attr, ": ", gain
-        return gain
+    @staticmethod
+    def table_gains(class_counts, tables, target_attr, attrs, debug=False):
+        """
+        The information gain of every candidate attribute of a population, computed from its count tables
+
+        :param class_counts: (dict) class value -> count (see DataSet.contingency)
+        :param tables: (dict) attribute name -> value -> class value -> count (see DataSet.contingency)
+        :param target_attr: (Attribute) attribute to classify based on
+        :param attrs: (Attributes or [Attribute, ...]) the candidate attributes
+        :param debug: (Boolean) Enable or disable debug messages
+        :return:
+        ([(Attribute, float), ...]) each attribute with its gain, in the order of attrs
+        """
+        current_entropy = DataSet.counts_entropy(class_counts, target_attr)[0]
+        population_size = sum(class_counts.values())
+
+        result = list()
+        for attr in attrs:
+            gain = current_entropy - DataSet.table_remainder(tables[attr.name], target_attr, attr, population_size)
+            if debug is True:
+                print attr, ": ", gain
+            result.append((attr, gain))
+        return result
 
     def partial_count(self, classifier):
         """
@@ -196,7 +394,1065 @@ class DataSet:
         :return:
         (float): number of times that one of the classifier's arbitrary values appears in the dataset
         """
-        classifier.values.sort()
         value = classifier.values[0]
-        partial_set = [x for x in self.all_examples if x.get_value(classifier) == value]
-        return float(len(partial_set))
+        return float(self.class_counts(classifier).get(value, 0))
+
+
+def _bincount(keys, size):
+    """
+    :param keys: (sequence of int) integer keys in range(size)
+    :param size: (int) number of distinct keys
+    :return:
+    ([int, ...]) number of occurrences of each key
+    """
+    if size <= 8:
+        # a handful of scans at C speed beats one interpreted pass
+        return [keys.count(key) for key in range(size)]
+    counts = [0] * size
+    for key in keys:
+        counts[key] += 1
+    return counts
+
+
+# number of rows read_batches gathers before handing them over
+BATCH_SIZE = 4096
+
+
+def read_batches(data_file, store, batch_size=BATCH_SIZE, errors=None):
+    """
+    Read a data file lazily, batch_size rows at a time. Labels are stripped without a regular expression, and values
+    are checked and encoded with the store's dictionaries
+
+    :param data_file: (file) data file to read the examples from
+    :param store: (EncodedStore) gives the attributes of the rows and the codes of their values. No rows are added to
+                            it
+    :param batch_size: (int) number of rows in each batch
+    :param errors: (list) if given, invalid rows are skipped and the reason for each is appended to this list.
+                        Otherwise the first invalid row stops the program
+    :return:
+    (generator of EncodedStore) each batch of valid rows, in a store of its own with the same attributes and codes
+    """
+    codes_of = store.codes_of
+    width = store.width
+    batch = store.empty()
+    codes = batch.codes
+    line_num = 0
+    for next_line in data_file:
+        line_num += 1
+        # a label is everything up to the last ':'
+        values = next_line.rstrip().rpartition(':')[2].split(',')
+        if len(values) == width:
+            try:
+                codes.extend([column_codes[value] for column_codes, value in zip(codes_of, values)])
+            except KeyError:
+                pass
+            else:
+                if len(codes) >= batch_size * width:
+                    yield batch
+                    batch = store.empty()
+                    codes = batch.codes
+                continue
+
+        row, error = store.encode_row(values, data_file.name, line_num)
+        if error is None:
+            # a row with numbers
+            batch.append_row(row)
+            if len(codes) >= batch_size * width:
+                yield batch
+                batch = store.empty()
+                codes = batch.codes
+            continue
+        if errors is None:
+            sys.stderr.write(error)
+            sys.exit(1)
+        errors.append(error)
+
+    if codes:
+        yield batch
+
+
+# names and values are bytes in whatever encoding the attributes file uses: JSON gets them decoded as Latin-1, which
+# maps every byte to a character and back
+JSON_ENCODING = 'latin-1'
+
+# layout of a cache file: magic, version and header length, a JSON header, then the codes of the rows, row after row,
+# and the numbers of each numeric column as doubles, row after row, each starting at the next multiple of
+# CACHE_ALIGNMENT
+CACHE_MAGIC = 'ID3CACHE'
+CACHE_VERSION = 2
+CACHE_PREFIX = struct.Struct('<8sHI')
+CACHE_ALIGNMENT = 8
+CACHE_SUFFIX = '.id3c'
+
+
+def load_cached(data_file, attributes, cache_dir, errors=None):
+    """
+    Load a data file through a binary cache. When the cache holds the same attributes and the data file's content
+    has not changed since it was written, the cache is memory-mapped and its codes and numbers are used in place,
+    without parsing or copying anything. Otherwise the data file is parsed and the cache (re)written for next time.
+
+    :param data_file: (file) data file to read the examples from
+    :param attributes: (Attributes) the attributes of each example
+    :param cache_dir: (str) directory of the cache files
+    :param errors: (list) collects the invalid rows instead of stopping (see read_batches). A data file with
+                        invalid rows is not cached, so they are reported again on every run
+    :return:
+    (EncodedDataSet) the examples
+    """
+    try:
+        data_file.seek(0)
+    except (AttributeError, IOError):
+        # a pipe can only be read once
+        return EncodedDataSet(data_file, attributes, errors=errors)
+
+    schema = EncodedStore(attributes)
+    digest = hashlib.sha1(json.dumps([schema.names, schema.values], encoding=JSON_ENCODING))
+    for block in iter(lambda: data_file.read(1 << 20), ''):
+        digest.update(block)
+    digest = digest.hexdigest()
+    data_file.seek(0)
+
+    # data files of the same name in different directories get caches of their own
+    location = hashlib.sha1(os.path.abspath(data_file.name)).hexdigest()[:12]
+    path = os.path.join(cache_dir, '{}-{}{}'.format(os.path.basename(data_file.name), location, CACHE_SUFFIX))
+    store = _map_cache(path, schema, digest)
+    if store is not None:
+        return EncodedDataSet(store=store)
+
+    skipped = list()
+    data = EncodedDataSet(data_file, attributes, errors=skipped if errors is not None else None)
+    if skipped:
+        errors.extend(skipped)
+    else:
+        _write_cache(path, data.store, digest)
+    return data
+
+
+def _write_cache(path, store, digest):
+    """
+    :param path: (str) path of the cache file
+    :param store: (EncodedStore) the rows to cache
+    :param digest: (str) content hash of the data file and attributes
+    """
+    header = json.dumps({'names': store.names, 'values': store.values, 'digest': digest, 'rows': len(store),
+                         'typecode': store.typecode, 'byteorder': sys.byteorder}, encoding=JSON_ENCODING)
+    start = CACHE_PREFIX.size + len(header)
+    padding = -start % CACHE_ALIGNMENT
+
+    if not os.path.isdir(os.path.dirname(path) or '.'):
+        os.makedirs(os.path.dirname(path))
+    # write next to the final file and rename, so a reader never sees half a cache
+    temporary = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary, 'wb') as cache:
+        cache.write(CACHE_PREFIX.pack(CACHE_MAGIC, CACHE_VERSION, len(header)))
+        cache.write(header)
+        cache.write('\0' * padding)
+        array(store.typecode, store.codes).tofile(cache)
+        for column in store.numeric_columns:
+            cache.write('\0' * (-cache.tell() % CACHE_ALIGNMENT))
+            array('d', store.numbers[column]).tofile(cache)
+    os.rename(temporary, path)
+
+
+def _map_cache(path, schema, digest):
+    """
+    :param path: (str) path of the cache file
+    :param schema: (EncodedStore) an empty store with the expected attributes
+    :param digest: (str) expected content hash of the data file and attributes
+    :return:
+    (EncodedStore) a store whose codes and numbers are mapped from the cache file, None if there is no valid cache
+    """
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as cache:
+        magic, version, header_size = CACHE_PREFIX.unpack(cache.read(CACHE_PREFIX.size))
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            return None
+        header = json.loads(cache.read(header_size))
+        # json gives back unicode, the schema holds the bytes of the attributes file
+        names = [name.encode(JSON_ENCODING) for name in header['names']]
+        values = [tuple(value.encode(JSON_ENCODING) for value in column) for column in header['values']]
+        if (header['digest'] != digest or names != schema.names or values != schema.values or
+                header['typecode'] != schema.typecode or header['byteorder'] != sys.byteorder):
+            return None
+
+        start = CACHE_PREFIX.size + header_size
+        start += -start % CACHE_ALIGNMENT
+        # a private (copy-on-write) mapping: its pages stay shared with every other process that maps the file
+        mapping = mmap.mmap(cache.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    item = {'B': ctypes.c_uint8, 'H': ctypes.c_uint16}[schema.typecode]
+    rows = header['rows']
+    store = schema.empty()
+    store.codes = (item * (rows * schema.width)).from_buffer(mapping, start)
+    start += ctypes.sizeof(store.codes)
+    for column in schema.numeric_columns:
+        start += -start % CACHE_ALIGNMENT
+        store.numbers[column] = (ctypes.c_double * rows).from_buffer(mapping, start)
+        start += ctypes.sizeof(store.numbers[column])
+    return store
+
+
+def contingencies(data_sets, target_attr, attrs):
+    """
+    DataSet.contingency for several disjoint views of the same EncodedStore, computed in a single sweep over their
+    rows: every count is keyed by (data set, attribute, value, class)
+
+    :param data_sets: ([EncodedDataSet, ...]) views of the same store
+    :param target_attr: (Attribute) attribute to classify based on
+    :param attrs: (Attributes or [Attribute, ...]) the attributes to count
+    :return:
+    ([(class_counts, tables), ...]) the contingency of each data set, in order
+    """
+    if not data_sets:
+        return list()
+    if any(isinstance(data, BitsetDataSet) for data in data_sets):
+        # bitset views count on their own, the others in one sweep
+        swept = iter(contingencies([data for data in data_sets if not isinstance(data, BitsetDataSet)], target_attr,
+                                   attrs))
+        return [data.contingency(target_attr, attrs) if isinstance(data, BitsetDataSet) else next(swept)
+                for data in data_sets]
+
+    store = data_sets[0].store
+    codes = store.codes
+    offsets = list()
+    slots = list()
+    for slot, data in enumerate(data_sets):
+        rows = data.row_indices()
+        offsets.extend([row * store.width for row in rows])
+        slots.extend([slot] * len(rows))
+
+    target = store.column(target_attr)
+    classes = store.values[target]
+    num_classes = len(classes)
+    labels = [codes[offset + target] for offset in offsets]
+
+    results = [(dict(), dict()) for _ in data_sets]
+    counts = _bincount([slot * num_classes + label for slot, label in zip(slots, labels)],
+                       len(data_sets) * num_classes)
+    for slot, (class_counts, _) in enumerate(results):
+        for label in range(num_classes):
+            size = counts[slot * num_classes + label]
+            if size:
+                class_counts[classes[label]] = size
+
+    for attr in attrs:
+        column = store.column(attr)
+        values = store.values[column]
+        arity = len(values)
+        # fold data set, value and class into one key so a single bincount gives every table
+        keys = [(slot * arity + codes[offset + column]) * num_classes + label
+                for slot, offset, label in zip(slots, offsets, labels)]
+        counts = _bincount(keys, len(data_sets) * arity * num_classes)
+        for slot, (_, tables) in enumerate(results):
+            table = dict()
+            for code in range(arity):
+                base = (slot * arity + code) * num_classes
+                row = dict()
+                for label in range(num_classes):
+                    size = counts[base + label]
+                    if size:
+                        row[classes[label]] = size
+                if row:
+                    table[values[code]] = row
+            tables[attr.name] = table
+
+    return results
+
+
+class PartitionStatistics(object):
+    """
+    The count tables of fixed, disjoint partitions of a data set, for trees trained on unions of the partitions (the
+    training sets of k-fold validation). The examples of a node are the examples of the node's split path in each of
+    the partitions its tree was trained on, so the node's tables are the sum of the tables of those partitions along
+    that path. Each partition is counted once per path, however many trees reach it.
+    """
+
+    def __init__(self, partitions, target_attr, attrs):
+        """
+        :param partitions: ([EncodedDataSet, ...]) views of the same store, with no row in common
+        :param target_attr: (Attribute) attribute to classify based on
+        :param attrs: (Attributes or [Attribute, ...]) the attributes the trees can split on
+        """
+        self.partitions = partitions
+        self.target_attr = target_attr
+        self.attrs = list(attrs)
+        # (path, partition) -> the examples of the partition along the path, and their contingency once counted
+        self.examples = dict()
+        self.tables = dict()
+
+    def fold(self, members):
+        """
+        :param members: ([int, ...]) the partitions a tree is trained on
+        :return:
+        (FoldStatistics) the statistics of that tree's training set
+        """
+        return FoldStatistics(self, members)
+
+    def examples_at(self, path, member):
+        """
+        :param path: (((str, str), ...)) the attribute name and value of every split from the root
+        :param member: (int) a partition
+        :return:
+        (EncodedDataSet) the examples of the partition that follow the path
+        """
+        if not path:
+            return self.partitions[member]
+        data = self.examples.get((path, member))
+        if data is None:
+            parent = self.examples_at(path[:-1], member)
+            name = path[-1][0]
+            # split from a copy of the rows: partition regroups them in place, and the parent may be split on another
+            # attribute for another tree
+            split = EncodedDataSet(store=parent.store, rows=array('I', parent.row_indices())).partition(
+                [attr for attr in self.attrs if attr.name == name][0])
+            for value, example_set in split.items():
+                self.examples[(path[:-1] + ((name, value),), member)] = example_set
+            data = self.examples[(path, member)]
+        return data
+
+    def count(self, path, members):
+        """
+        Counts the examples of the given partitions along a path that are not counted yet, in a single sweep
+
+        :param path: (((str, str), ...)) the attribute name and value of every split from the root
+        :param members: ([int, ...]) the partitions
+        """
+        missing = [member for member in members if (path, member) not in self.tables]
+        if not missing:
+            return
+        used = set(name for name, _ in path)
+        attrs = [attr for attr in self.attrs if attr.name not in used]
+        data_sets = [self.examples_at(path, member) for member in missing]
+        for member, statistics in zip(missing, contingencies(data_sets, self.target_attr, attrs)):
+            self.tables[(path, member)] = statistics
+
+
+class FoldStatistics(object):
+    """The statistics of a training set made of some of the partitions of a PartitionStatistics"""
+
+    def __init__(self, shared, members):
+        """
+        :param shared: (PartitionStatistics) the statistics of every partition
+        :param members: ([int, ...]) the partitions in the training set
+        """
+        self.shared = shared
+        self.members = list(members)
+
+    def contingency(self, path, attrs):
+        """
+        DataSet.contingency of the training examples along a split path, added up from the partitions' tables
+
+        :param path: (((str, str), ...)) the attribute name and value of every split from the root
+        :param attrs: ([Attribute, ...]) the candidate attributes, none of them split on along the path
+        :return:
+        (class_counts, tables) as in DataSet.contingency
+        """
+        self.shared.count(path, self.members)
+        class_counts = dict()
+        tables = dict((attr.name, dict()) for attr in attrs)
+        for member in self.members:
+            member_counts, member_tables = self.shared.tables[(path, member)]
+            for label, size in member_counts.items():
+                class_counts[label] = class_counts.get(label, 0) + size
+            for name, table in tables.items():
+                for value, row in member_tables[name].items():
+                    counts = table.setdefault(value, dict())
+                    for label, size in row.items():
+                        counts[label] = counts.get(label, 0) + size
+        return class_counts, tables
+
+
+class EncodedStore(object):
+    """
+    The rows of a data set as small integer codes, in one contiguous row-major array
+    (rows x attributes). A value's code is its index in the attribute's list of values
+    at the time the store was created. The numbers of a numeric attribute are kept in an
+    array of doubles of their own, one per row; its column of codes holds 0.
+    """
+
+    def __init__(self, attributes):
+        """
+        :param attributes: (Attributes) the attributes stored in each row, in column order
+        """
+        self.attributes = list(attributes.attributes)
+        self.names = [attr.name for attr in self.attributes]
+        self.width = len(self.attributes)
+        # column of each attribute name
+        self.index = dict((name, ndx) for ndx, name in enumerate(self.names))
+        # code -> value, and value -> code, for each column
+        self.values = [tuple(attr.values) for attr in self.attributes]
+        self.codes_of = [dict((value, code) for code, value in enumerate(values)) for values in self.values]
+        self.numeric_columns = [ndx for ndx, attr in enumerate(self.attributes) if attr.numeric]
+
+        largest = max([len(values) for values in self.values] + [1])
+        self.typecode = 'B' if largest <= 0x100 else 'H'
+        # an array, or a read-only ctypes array over a memory-mapped cache file (see load_cached)
+        self.codes = array(self.typecode)
+        # for each column, its numbers row after row if it is numeric, None otherwise. Arrays of doubles, or ctypes
+        # arrays like the codes
+        self.numbers = [array('d') if attr.numeric else None for attr in self.attributes]
+
+    def __len__(self):
+        return len(self.codes) // self.width if self.width else 0
+
+    def empty(self):
+        """
+        :return:
+        (EncodedStore) a new store with the same attributes and codes, and no rows
+        """
+        store = copy.copy(self)
+        store.codes = array(self.typecode)
+        store.numbers = [array('d') if numbers is not None else None for numbers in self.numbers]
+        return store
+
+    def encode_row(self, values, filename, line_num):
+        """
+        Encode one row of values, verifying that they are in the known domains for each attribute
+
+        :param values: ([str, ...]) the values of the row, in column order
+        :param filename: (str) name of the file the row was read from, for error messages
+        :param line_num: (int) line of the file the row was read from, for error messages
+        :return:
+        (codes, error)
+        codes: ([int or float, ...]) the codes of the row, with the numbers of its numeric attributes in their
+                                    columns, None if it is not valid
+        error: (str) why the row is not valid, None if it is
+        """
+        if len(values) != self.width:
+            return None, ("%s: %d: Incorrect number of attributes (saw %d, expected %d)\n" %
+                          (filename, line_num, len(values), self.width))
+        if not self.numeric_columns:
+            try:
+                return [codes[value] for codes, value in zip(self.codes_of, values)], None
+            except KeyError:
+                pass
+
+        row = list()
+        for ndx in range(self.width):
+            attr = self.attributes[ndx]
+            if attr.numeric:
+                number = to_number(values[ndx])
+                if number is None:
+                    return None, ("%s: %d: Value %s is not a number for attribute %s\n" %
+                                  (filename, line_num, values[ndx], attr.name))
+                row.append(number)
+            elif values[ndx] in self.codes_of[ndx]:
+                row.append(self.codes_of[ndx][values[ndx]])
+            else:
+                return None, ("%s: %d: Value %s not in known values %s for attribute %s\n" %
+                              (filename, line_num, values[ndx], list(self.values[ndx]), attr.name))
+        return row, None
+
+    def append(self, values, filename, line_num):
+        """
+        Encode and store one row of values, verifying that they are in the known domains for
+        each attribute
+
+        :param values: ([str, ...]) the values of the row, in column order
+        :param filename: (str) name of the file the row was read from, for error messages
+        :param line_num: (int) line of the file the row was read from, for error messages
+        :return:
+        (int) the index of the new row
+        """
+        row, error = self.encode_row(values, filename, line_num)
+        if error is not None:
+            sys.stderr.write(error)
+            sys.exit(1)
+        self.append_row(row)
+        return len(self) - 1
+
+    def append_row(self, row):
+        """
+        Store one encoded row
+
+        :param row: ([int or float, ...]) the codes of the row, with its numbers (see encode_row)
+        """
+        codes = self._writable()
+        if self.numeric_columns:
+            row = list(row)
+            for column in self.numeric_columns:
+                self.numbers[column].append(row[column])
+                row[column] = 0
+        codes.extend(row)
+
+    def extend(self, batch):
+        """
+        Store a batch of encoded rows
+
+        :param batch: (EncodedStore) the rows, in a store with the same attributes and codes (see read_batches)
+        :return:
+        (int) the index of the first new row
+        """
+        first = len(self)
+        self._writable().extend(batch.codes)
+        for column in self.numeric_columns:
+            self.numbers[column].extend(batch.numbers[column])
+        return first
+
+    def add(self, data):
+        """
+        Store every example of a data set
+
+        :param data: (DataSet) the examples to add. An EncodedDataSet over a store with the same columns and codes
+                        is copied code for code, other examples are encoded value by value
+        :return:
+        (array('I')) the indices of the new rows, in the order of the examples
+        """
+        first = len(self)
+        source = getattr(data, 'store', None)
+        if source is not None and source.names == self.names and source.values == self.values:
+            width = self.width
+            codes = source.codes
+            rows = data.row_indices()
+            batch = self.empty()
+            for row in rows:
+                batch.codes.extend(codes[row * width:(row + 1) * width])
+            for column in self.numeric_columns:
+                numbers = source.numbers[column]
+                batch.numbers[column].extend([numbers[row] for row in rows])
+            self.extend(batch)
+        else:
+            # column of the example -> column of the store, for each set of attributes the examples use
+            layouts = dict()
+            for line_num, example in enumerate(data.all_examples, 1):
+                if isinstance(example, Example):
+                    columns = layouts.get(id(example.schema))
+                    if columns is None:
+                        columns = layouts[id(example.schema)] = self.columns_of(example.schema)
+                    if columns:
+                        self.append_row([example.codes[ndx] for ndx in columns])
+                        continue
+                self.append([example.get_value(name) for name in self.names], '<example>', line_num)
+        return array('I', range(first, len(self)))
+
+    def columns_of(self, attributes):
+        """
+        :param attributes: (AttributeLayout) the attributes of an Example
+        :return:
+        ([int, ...]) for each column of the store, the index of the same attribute among the given ones, or None if
+                        they do not have every column with the same values
+        """
+        columns = list()
+        for column, name in enumerate(self.names):
+            ndx = attributes.position(name)
+            if (ndx is None or attributes.attributes[ndx].values != self.values[column] or
+                    attributes.attributes[ndx].numeric != self.attributes[column].numeric):
+                return None
+            columns.append(ndx)
+        return columns
+
+    def _writable(self):
+        """
+        :return:
+        (array) the codes, copied out of a memory-mapped cache file first if need be, with the numbers
+        """
+        if not isinstance(self.codes, array):
+            self.codes = array(self.typecode, self.codes)
+            self.numbers = [array('d', numbers) if numbers is not None else None for numbers in self.numbers]
+        return self.codes
+
+    def schema(self):
+        """
+        :return:
+        (Attributes) copies of the stored attributes, in column order, with their values in code order
+        """
+        schema = Attributes()
+        for attr, values in zip(self.attributes, self.values):
+            if attr.numeric:
+                schema.append(Attribute(attr.name, [], numeric=True))
+            else:
+                schema.append(Attribute(attr.name, values))
+        return schema
+
+    def column(self, attr):
+        """
+        :param attr: (Attribute or str) an attribute, or an attribute's name
+        :return:
+        (int) the column that holds the attribute
+        """
+        if isinstance(attr, str):
+            return self.index[attr]
+        return self.index[attr.name]
+
+    def gather(self, rows, column):
+        """
+        :param rows: (iterable of int or None) the rows to read, None for every row
+        :param column: (int) the column to read
+        :return:
+        (list or array) the codes of that column for the given rows
+        """
+        if rows is None:
+            return self.codes[column::self.width]
+        codes = self.codes
+        width = self.width
+        return [codes[row * width + column] for row in rows]
+
+
+class EncodedExample(object):
+    """A view of one row of an EncodedStore with the interface of an Example"""
+
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def get_value(self, attr):
+        column = self.store.column(attr)
+        if self.store.numbers[column] is not None:
+            return self.store.numbers[column][self.row]
+        return self.store.values[column][self.store.codes[self.row * self.store.width + column]]
+
+    @property
+    def values(self):
+        return dict((name, self.get_value(name)) for name in self.store.names)
+
+
+class EncodedDataSet(DataSet):
+    """
+    A DataSet stored as integer codes. It is a view of the rows of an EncodedStore (all of them, a
+    list of row indices, or a range of a list of row indices), so partitions of a data set share the
+    storage of the whole.
+    """
+
+    def __init__(self, data_file=False, attributes=False, store=None, rows=None, bounds=None, errors=None):
+        """
+        :param data_file: (file) data file to read the examples from
+        :param attributes: (Attributes) the attributes of each example, used to create a new store
+        :param store: (EncodedStore) an existing store to view instead of creating a new one
+        :param rows: (iterable of int) the rows of the store in this data set, None for all of them.
+                        An array('I') is shared, not copied
+        :param bounds: ((int, int)) only view rows[start:stop]
+        :param errors: (list) collects the invalid rows of the data file instead of stopping (see read_batches)
+        """
+        self.store = store if store is not None else EncodedStore(attributes)
+        self.rows = rows if rows is None or isinstance(rows, array) else array('I', rows)
+        self.bounds = bounds
+        # column -> the rows in ascending order of that numeric column, for the columns sorted by presort
+        self.orders = None
+        if data_file:
+            for batch in read_batches(data_file, self.store, errors=errors):
+                first = self.store.extend(batch)
+                if self.rows is not None or self.bounds is not None:
+                    for row in range(first, len(self.store)):
+                        self._add_row(row)
+
+    @staticmethod
+    def stream(data_file, attributes, batch_size=BATCH_SIZE, errors=None):
+        """
+        Read a data file lazily, one data set of at most batch_size examples at a time, so that the whole file never
+        has to fit in memory
+
+        :param data_file: (file) data file to read the examples from
+        :param attributes: (Attributes) the attributes of each example
+        :param batch_size: (int) number of examples in each data set
+        :param errors: (list) collects the invalid rows instead of stopping (see read_batches)
+        :return:
+        (generator of EncodedDataSet) consecutive parts of the file, each with a store of its own
+        """
+        for store in read_batches(data_file, EncodedStore(attributes), batch_size, errors):
+            yield EncodedDataSet(store=store)
+
+    def _add_row(self, row):
+        if self.bounds is not None:
+            # stop sharing the list of rows before changing it
+            self.rows = array('I', self.row_indices())
+            self.bounds = None
+        if self.rows is not None:
+            self.rows.append(row)
+        elif row != len(self.store) - 1:
+            # this view no longer covers the whole store
+            self.rows = array('I', range(len(self.store) - 1))
+            self.rows.append(row)
+
+    def row_indices(self):
+        """
+        :return:
+        (iterable of int) the rows of the store that make up this data set
+        """
+        if self.rows is None:
+            return range(len(self.store))
+        if self.bounds is None:
+            return self.rows
+        return self.rows[self.bounds[0]:self.bounds[1]]
+
+    @property
+    def all_examples(self):
+        return [EncodedExample(self.store, row) for row in self.row_indices()]
+
+    @all_examples.setter
+    def all_examples(self, examples):
+        self.rows = array('I')
+        self.bounds = None
+        for example in examples:
+            self.append(example)
+
+    def __len__(self):
+        if self.bounds is not None:
+            return self.bounds[1] - self.bounds[0]
+        return len(self.rows) if self.rows is not None else len(self.store)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [EncodedExample(self.store, row) for row in self.row_indices()[key]]
+        return EncodedExample(self.store, self.row_indices()[key])
+
+    def append(self, example):
+        if isinstance(example, EncodedExample) and example.store is self.store:
+            self._add_row(example.row)
+        else:
+            values = [example.get_value(name) for name in self.store.names]
+            self._add_row(self.store.append(values, '<example>', len(self.store) + 1))
+
+    def encode(self, attributes):
+        return self
+
+    def view(self, rows):
+        """
+        :param rows: (iterable of int) rows of the store
+        :return:
+        (EncodedDataSet) a data set of the given rows that shares this data set's store
+        """
+        return EncodedDataSet(store=self.store, rows=rows)
+
+    def partition(self, attr):
+        """
+        Split this data set by the value of an attribute without copying any examples: the rows
+        are reordered in place, grouped by value, and every group is returned as a range view of
+        the same list of rows (a counting sort, as in classic CART implementations). The first
+        partition gives the data set a private list of rows, so the caller's rows are never
+        reordered.
+
+        The split of a numeric attribute (see attributes.threshold_split) groups the rows by side
+        of its threshold. The sorted orders of the data set (see presort) are split along, so
+        every group keeps its rows sorted without sorting again.
+
+        :param attr: (Attribute) the attribute to split on
+        :return:
+        (dict) value -> (EncodedDataSet) the examples with that value
+        """
+        if self.bounds is None:
+            self.rows = array('I', self.row_indices())
+            self.bounds = 0, len(self.rows)
+        start, stop = self.bounds
+        rows = self.rows[start:stop]
+
+        column = self.store.column(attr)
+        if attr.threshold is not None:
+            values = attr.values
+            groups = [array('I'), array('I')]
+            numbers = self.store.numbers[column]
+            threshold = attr.threshold
+            for row in rows:
+                groups[numbers[row] > threshold].append(row)
+        else:
+            values = self.store.values[column]
+            groups = [array('I') for _ in values]
+            for row, code in zip(rows, self.store.gather(rows, column)):
+                groups[code].append(row)
+
+        orders = [None] * len(groups)
+        if self.orders:
+            side = dict()
+            for ndx, group in enumerate(groups):
+                for row in group:
+                    side[row] = ndx
+            orders = [dict() for _ in groups]
+            for sorted_column, order in self.orders.items():
+                parts = [array('I') for _ in groups]
+                for row in order:
+                    parts[side[row]].append(row)
+                for ndx, part in enumerate(parts):
+                    orders[ndx][sorted_column] = part
+
+        partitions = dict()
+        for code, group in enumerate(groups):
+            self.rows[start:start + len(group)] = group
+            partitions[values[code]] = EncodedDataSet(store=self.store, rows=self.rows,
+                                                      bounds=(start, start + len(group)))
+            partitions[values[code]].orders = orders[code]
+            start += len(group)
+        return partitions
+
+    def presort(self, attrs):
+        """
+        Sorts the rows by each numeric attribute, once: partition keeps the orders in every part
+
+        :param attrs: ([Attribute, ...]) numeric attributes
+        """
+        rows = self.row_indices()
+        self.orders = dict()
+        for attr in attrs:
+            column = self.store.column(attr)
+            self.orders[column] = array('I', sorted(rows, key=self.store.numbers[column].__getitem__))
+
+    def best_threshold(self, target_attr, attr):
+        """
+        The best binary split of a numeric attribute, found in one scan of the rows in ascending order of the
+        attribute (see presort) that keeps the class counts of the rows below each candidate threshold. Every
+        threshold halfway between two consecutive numbers is scored as a two-value attribute would be; the first
+        of the best ones is kept
+
+        :param target_attr: (Attribute) attribute to classify based on
+        :param attr: (Attribute) a numeric attribute
+        :return:
+        (Attribute, float) the split (see attributes.threshold_split) and its gain, None if every example has the
+                            same number
+        """
+        store = self.store
+        column = store.column(attr)
+        numbers = store.numbers[column]
+        target = store.column(target_attr)
+        classes = store.values[target]
+        order = self.orders.get(column) if self.orders else None
+        if order is None:
+            order = sorted(self.row_indices(), key=numbers.__getitem__)
+
+        if not order:
+            return None
+        keys = [numbers[row] for row in order]
+        labels = store.gather(order, target)
+        totals = _bincount(labels, len(classes))
+        class_counts = dict((classes[label], size) for label, size in enumerate(totals) if size)
+        current_entropy = DataSet.counts_entropy(class_counts, target_attr)[0]
+        population_size = len(order)
+        below = [0] * len(classes)
+        best = None
+        # a cut between two runs of equal numbers that are both of one same class never scores better than the cuts
+        # around them (Fayyad and Irani), so it is only scored once the run above it is known to be mixed, or of
+        # another class: the cut waits in pending with the class counts below it
+        pending = None
+        previous = None
+        run_class = previous_class = None
+        for key, label in zip(keys, labels) + [(None, None)]:
+            if key != previous:
+                if pending is not None and (run_class is None or previous_class is None or
+                                            run_class != previous_class):
+                    counts, lower, upper = pending
+                    groups = [dict((classes[code], size) for code, size in enumerate(counts) if size),
+                              dict((classes[code], total - size)
+                                   for code, (size, total) in enumerate(zip(counts, totals)) if total - size)]
+                    gain = current_entropy - DataSet.split_remainder(groups, target_attr, population_size)
+                    if best is None or gain > best[1]:
+                        threshold = (lower + upper) / 2.0
+                        if not lower <= threshold < upper:
+                            # the two numbers are too close to have a number between them
+                            threshold = lower
+                        best = threshold, gain
+                if key is None:
+                    break
+                pending = (tuple(below), previous, key) if previous is not None else None
+                previous_class = run_class
+                run_class = label
+                previous = key
+            elif run_class != label:
+                run_class = None
+            below[label] += 1
+
+        if best is None:
+            return None
+        return threshold_split(attr.name, best[0]), best[1]
+
+    def gather(self, column):
+        """
+        :param column: (int) a column of the store
+        :return:
+        (sequence of int) the codes of that column for the examples of this data set
+        """
+        return self.store.gather(self.row_indices() if self.rows is not None else None, column)
+
+    def values_of(self, attr):
+        column = self.store.column(attr)
+        if self.store.numbers[column] is not None:
+            numbers = self.store.numbers[column]
+            return [numbers[row] for row in self.row_indices()]
+        values = self.store.values[column]
+        return [values[code] for code in self.gather(column)]
+
+    def class_counts(self, classifier):
+        column = self.store.column(classifier)
+        labels = self.gather(column)
+        values = self.store.values[column]
+        counts = dict()
+        for code, size in enumerate(_bincount(labels, len(values))):
+            if size:
+                counts[values[code]] = size
+        return counts
+
+    def contingency(self, target_attr, attrs):
+        return contingencies([self], target_attr, attrs)[0]
+
+
+# a bitset view whose rows are fewer than 1 in this many of the indexed rows is partitioned into row lists
+BITSET_SPARSE = 64
+
+
+def _popcount(bits):
+    """
+    :param bits: (int) a bitset
+    :return:
+    (int) the number of bits set
+    """
+    return bin(bits).count('1')
+
+
+def _bitset_rows(bits):
+    """
+    :param bits: (int) a bitset of rows
+    :return:
+    (array) the rows whose bit is set, in ascending order
+    """
+    digits = bin(bits)[:1:-1]
+    rows = array('I')
+    find = digits.find
+    row = find('1')
+    while row >= 0:
+        rows.append(row)
+        row = find('1', row + 1)
+    return rows
+
+
+class BitsetIndex(object):
+    """
+    The rows of an EncodedStore as bitsets: one (Python int) for each value of each column, bit i set when row i has
+    that value. A set of rows is a bitset too, so the rows of a set that have a value are a single AND, and their
+    number a popcount
+    """
+
+    def __init__(self, store):
+        """
+        :param store: (EncodedStore) the store to index. Its rows appended later are not indexed
+        """
+        self.store = store
+        self.size = len(store)
+        self.bits = list()
+        for column in range(store.width):
+            # lowest row last, as int() reads its most significant digit first
+            digits = array('B', store.gather(None, column)).tostring()[::-1]
+            self.bits.append([int(digits.translate('0' * code + '1' + '0' * (255 - code)) or '0', 2)
+                              for code in range(len(store.values[column]))])
+
+    def bitset(self, rows):
+        """
+        :param rows: (iterable of int) indexed rows
+        :return:
+        (int) the bitset of those rows
+        """
+        digits = bytearray('0' * self.size)
+        for row in rows:
+            digits[row] = '1'
+        return int(str(digits[::-1]) or '0', 2)
+
+    @staticmethod
+    def indexable(attributes):
+        """
+        :param attributes: (Attributes) the attributes of a store
+        :return:
+        (boolean) whether the store can be indexed: no attribute is numeric, and none has more than 256 values
+        """
+        return not any(attr.numeric or len(attr.values) > 256 for attr in attributes.attributes)
+
+    @staticmethod
+    def suits(attributes):
+        """
+        :param attributes: (Attributes) the attributes of a data set, classifier included
+        :return:
+        (boolean) whether the data set is better counted with bitsets: it is indexable, and at least half of its
+                    attributes have two values or fewer
+        """
+        attrs = attributes.attributes
+        return (BitsetIndex.indexable(attributes) and
+                2 * sum(1 for attr in attrs if len(attr.values) <= 2) >= len(attrs))
+
+
+class BitsetDataSet(EncodedDataSet):
+    """
+    A view of the rows of an EncodedStore kept as a bitset (see BitsetIndex), for data sets of mostly binary
+    attributes. Each count of a contingency table is a popcount of the AND of the view, a value and a class, a few
+    word-level operations per 64 rows whatever the number of rows in the view. Partitions are ANDs as well, until they
+    get too sparse for whole-store bitsets to pay (see BITSET_SPARSE): those are EncodedDataSets of row lists.
+
+    A row is in a bitset at most once, and only rows of the store that were indexed can be viewed.
+    """
+
+    def __init__(self, index, bits=None, size=None):
+        """
+        :param index: (BitsetIndex) the bitsets of the store
+        :param bits: (int) the rows in this data set, None for every indexed row
+        :param size: (int) the number of rows in this data set, if known
+        """
+        EncodedDataSet.__init__(self, store=index.store)
+        self.index = index
+        self.bits = bits if bits is not None else (1 << index.size) - 1
+        self.size = size if size is not None else _popcount(self.bits)
+
+    def row_indices(self):
+        return _bitset_rows(self.bits)
+
+    def __len__(self):
+        return self.size
+
+    def _add_row(self, row):
+        self.bits |= 1 << row
+        self.size = _popcount(self.bits)
+
+    def subset(self, bits):
+        """
+        :param bits: (int) rows of this data set
+        :return:
+        (EncodedDataSet) a data set of those rows: a BitsetDataSet, or a list of rows if they are too few
+        """
+        size = _popcount(bits)
+        if size * BITSET_SPARSE < self.index.size:
+            return EncodedDataSet(store=self.store, rows=_bitset_rows(bits))
+        return BitsetDataSet(self.index, bits, size)
+
+    def partition(self, attr):
+        if attr.threshold is not None:
+            return EncodedDataSet.partition(self, attr)
+        column = self.store.column(attr)
+        values = self.store.values[column]
+        return dict((values[code], self.subset(self.bits & value_bits))
+                    for code, value_bits in enumerate(self.index.bits[column]))
+
+    def gather(self, column):
+        return self.store.gather(self.row_indices(), column)
+
+    def class_counts(self, classifier):
+        column = self.store.column(classifier)
+        values = self.store.values[column]
+        counts = dict()
+        for code, value_bits in enumerate(self.index.bits[column]):
+            size = _popcount(self.bits & value_bits)
+            if size:
+                counts[values[code]] = size
+        return counts
+
+    def contingency(self, target_attr, attrs):
+        store = self.store
+        target = store.column(target_attr)
+        classes = store.values[target]
+        members = [self.bits & class_bits for class_bits in self.index.bits[target]]
+        totals = [_popcount(bits) for bits in members]
+        class_counts = dict((classes[label], size) for label, size in enumerate(totals) if size)
+
+        tables = dict()
+        for attr in attrs:
+            column = store.column(attr)
+            values = store.values[column]
+            last = len(values) - 1
+            # the counts of the last value are what the other values leave over
+            remaining = list(totals)
+            table = dict()
+            for code, value_bits in enumerate(self.index.bits[column]):
+                if code == last:
+                    sizes = remaining
+                else:
+                    sizes = [_popcount(value_bits & bits) if left else 0 for bits, left in zip(members, remaining)]
+                    remaining = [left - size for left, size in zip(remaining, sizes)]
+                row = dict((classes[label], size) for label, size in enumerate(sizes) if size)
+                if row:
+                    table[values[code]] = row
+            tables[attr.name] = table
+        return class_counts, tables
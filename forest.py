@@ -0,0 +1,128 @@
+"""
+File:           forest.py
+
+Description:
+A bagged ensemble of ID3 trees (a random forest). Every tree is trained on a bootstrap sample of the training
+examples, optionally choosing each split from a random subset of the attributes, and the forest classifies an example
+by the majority vote of its trees.
+
+A bootstrap sample is an array of row indices into the one integer-encoded training store (rows drawn more than once
+appear more than once), so no example is ever copied. The trees are trained across a process pool forked after the
+store is loaded, and only their compiled form is kept.
+"""
+
+import copy
+import multiprocessing
+import random
+from array import array
+
+from id3 import DTree
+
+# the training examples and the arguments of every tree, inherited by forked workers
+_forest_data = None
+_forest_setup = None
+
+
+def _grow_tree(task):
+    """
+    Trains one tree of a forest on its bootstrap sample
+
+    :param task: (int, int) index of the tree, and seed of its random draws
+    :return:
+    (CompiledTree) the tree
+    """
+    index, seed = task
+    classifier, attributes, options = _forest_setup
+    rng = random.Random(seed)
+    rows = _forest_data.row_indices()
+    size = len(rows)
+    sample = array('I', [rows[int(rng.random() * size)] for _ in range(size)])
+    dtree = DTree(classifier, _forest_data.view(sample), copy.copy(attributes), seed=rng.random(), **options)
+    return dtree.compile()
+
+
+class Forest(object):
+    """A majority vote of decision trees trained on bootstrap samples"""
+
+    def __init__(self, classifier, training_data, attributes, trees=10, max_features=None, jobs=1, seed=0,
+                 **options):
+        """
+        Trains a new forest
+
+        :param classifier: (Attribute) Attribute that is being used for classification
+        :param training_data: (DataSet) Set of training data
+        :param attributes: (Attributes) All attributes in this domain
+        :param trees: (int) Number of trees
+        :param max_features: (int) Number of attributes, drawn at random at every node, that a split is chosen from.
+                                    None for all of them (plain bagging)
+        :param jobs: (int) Number of processes that train trees
+        :param seed: (int) Seed of the bootstrap samples and of the attribute draws. The same seed gives the same
+                            forest, whatever the number of processes
+        :param options: limits passed on to every DTree (max_depth, min_examples_split, min_gain, max_nodes)
+        """
+        global _forest_data, _forest_setup
+        self.classifier = classifier
+        self.attributes = attributes
+
+        schema = copy.copy(attributes)
+        schema.append(classifier)
+        options = dict(options, max_features=max_features)
+        seeds = random.Random(seed)
+        tasks = [(index, seeds.random()) for index in range(trees)]
+
+        _forest_data = training_data.encode(schema)
+        _forest_setup = (classifier, attributes, options)
+        try:
+            if jobs > 1:
+                # the workers are forked after the store exists, so they share it
+                pool = multiprocessing.Pool(processes=min(jobs, trees))
+                try:
+                    self.trees = pool.map(_grow_tree, tasks)
+                finally:
+                    pool.close()
+                    pool.join()
+            else:
+                self.trees = [_grow_tree(task) for task in tasks]
+        finally:
+            _forest_data = None
+            _forest_setup = None
+
+    def __len__(self):
+        return len(self.trees)
+
+    def predict_batch(self, data):
+        """
+        Classifies a batch of examples by the majority vote of the trees. Each tree routes the whole batch at once
+        (see CompiledTree.predict_leaves), and only the vote counts of the batch are kept between trees. A tie goes to
+        the class that comes first in the classifier's values
+
+        :param data: (DataSet) the examples to classify
+        :return:
+        ([str, ...]) the predicted class of each example, in order
+        """
+        if not self.trees:
+            return list()
+        encoded = self.trees[0].encode(data)
+        classes = self.trees[0].classes
+        num_classes = len(classes)
+        votes = array('I', [0]) * (len(encoded) * num_classes)
+        for tree in self.trees:
+            label = tree.label
+            for offset, leaf in enumerate(tree.predict_leaves(encoded)):
+                votes[offset * num_classes + label[leaf]] += 1
+
+        predictions = list()
+        for offset in range(0, len(votes), num_classes):
+            counts = votes[offset:offset + num_classes]
+            predictions.append(classes[counts.index(max(counts))])
+        return predictions
+
+    def test(self, classifier, testing_data):
+        """
+        :param classifier: (Attribute) Attribute that is being used for classification
+        :param testing_data: (DataSet) Set of testing data
+        :return: (int) Number of test examples that were correctly classified by the forest
+        """
+        predictions = self.predict_batch(testing_data)
+        return sum(1 for predicted, actual in zip(predictions, testing_data.values_of(classifier))
+                   if predicted == actual)
@@ -18,30 +18,526 @@ classification (Entropy)
 """
 
 import copy
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+from array import array
+from cStringIO import StringIO
+
 import dataset
 from node import Node
 from attributes import Attribute
+from compiled import CompiledTree
+from observers import NodeEvent, PURE, OUT_OF_FEATURES, OUT_OF_EXAMPLES, LIMITED
+
+# the training store of the tree being built, inherited by forked gain workers
+_worker_store = None
+
+# deepest if statement nesting of a function generated by DTree.to_source (Python allows 100 levels of indentation)
+SOURCE_MAX_DEPTH = 50
+
+
+def _evaluate_gains(task):
+    """
+    Worker side of a parallel gain evaluation
+
+    :param task: ((name, values), [(name, values), ...], str) the classifier, a chunk of candidate attributes, and
+                    the node's rows as the bytes of an array('I')
+    :return:
+    ([float, ...]) the gain of each candidate, in order
+    """
+    target, candidates, rows = task
+    node_rows = array('I')
+    node_rows.fromstring(rows)
+    data = dataset.EncodedDataSet(store=_worker_store, rows=node_rows)
+    return [gain for _, gain in data.gains(Attribute(*target), [Attribute(*attr) for attr in candidates])]
+
 
+def _dot_string(text):
+    """
+    :param text: (str) a name or a value
+    :return:
+    (str) the text as a quoted DOT string, with its bytes as they are
+    """
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
 
-class DTree:
+
+class DTree(object):
     """Represents a decision tree created with the ID3 algorithm"""
 
-    def __init__(self, classifier, training_data, attributes):
+    def __init__(self, classifier, training_data, attributes, jobs=1, parallel_threshold=200000, level_wise=False,
+                 incremental=False, observer=None, max_depth=None, min_examples_split=None, min_gain=None,
+                 max_nodes=None, max_features=None, seed=None, statistics=None, lazy=False, bitsets=None):
         """
         Creates a new decision tree
 
         :param classifier: (Attribute) Attribute that is being used for classification
         :param training_data: (DataSet) Set of training data
-        :param attributes: (Attributes) All attributes in this domain
+        :param attributes: (Attributes) All attributes in this domain. A numeric attribute is split in two at the
+                                        threshold with the highest gain, and can be split again further down
+        :param jobs: (int) Number of processes that evaluate candidate splits. More than 1 turns bitsets off: the
+                            workers count the rows of the nodes they are handed
+        :param parallel_threshold: (int) Smallest (examples x candidate attributes) of a node whose candidate splits
+                                        are spread across the processes. Smaller nodes are evaluated serially
+        :param level_wise: (boolean) Build the tree one level at a time, breadth first (see id3_level_wise).
+                                        The tree is the same, unless max_nodes cuts it short
+        :param incremental: (boolean) Keep the count tables of every split, so the tree can be extended with new
+                                        examples later (see update). Not with numeric attributes
+        :param observer: (observers.Observer) Receives an event for every node that is built, None to record nothing
+        :param max_depth: (int) Nodes this deep (the root is at depth 0) become leaves, None for no limit
+        :param min_examples_split: (int) Nodes with fewer examples become leaves, None for no limit
+        :param min_gain: (float) Nodes whose best split gains less become leaves, None for no limit
+        :param max_nodes: (int) Nodes whose children would take the tree past this many nodes become leaves, in the
+                                order the nodes are built, None for no limit
+        A node stopped by a limit is classified like a node that ran out of features: by the dominant class of its
+        examples, or like_parent_like_child if they are evenly distributed
+        :param max_features: (int) Only this many of a node's attributes, drawn at random, are candidates to split it
+                                    (as in random forests), None for all of them
+        :param seed: (int) Seed of the random draws of max_features
+        :param statistics: (dataset.FoldStatistics) Count tables of the training examples by split path, added up from
+                                                    partitions shared with other trees (see
+                                                    dataset.PartitionStatistics), instead of counted from the examples.
+                                                    The training data must be the union of those partitions.
+                                                    Not with numeric attributes
+        :param lazy: (boolean) Build nothing up front: a node is expanded when an example being classified first
+                                reaches it (see predict_batch), and stays expanded. Anything that needs the whole tree
+                                (dump, compile, save, prune, update...) expands the rest of it first. Nodes expanded
+                                on demand are evaluated serially, and max_nodes and max_features follow the order they
+                                are expanded in
+        :param bitsets: (boolean) Count the examples as bitsets (see dataset.BitsetDataSet), which pays when most
+                                    attributes are binary. None to decide from the attributes (see
+                                    dataset.BitsetIndex.suits). Examples with numeric attributes, or that repeat a row
+                                    of their store, and trees built with more than one job are always counted row by
+                                    row
         """
+        global _worker_store
+        if classifier.numeric:
+            sys.stderr.write("error: the classifier '%s' is numeric\n" % classifier.name)
+            sys.exit(1)
+        numeric = [attr for attr in attributes.attributes if attr.numeric]
+        if numeric and (incremental or statistics is not None):
+            sys.stderr.write("error: numeric attributes can not be used with incremental or shared statistics\n")
+            sys.exit(1)
         self.classifier = classifier
         self.training_data = training_data
         self.attributes = attributes
+        self.jobs = jobs
+        self.parallel_threshold = parallel_threshold
+        self.incremental = incremental
+        self.observer = observer
+        self.max_depth = max_depth
+        self.min_examples_split = min_examples_split
+        self.min_gain = min_gain
+        self.max_nodes = max_nodes
+        self.max_features = max_features
+        self.random = random.Random(seed) if max_features is not None else None
+        self.statistics = statistics
+        # nodes may still be waiting to be expanded (see expand_all)
+        self.lazy = lazy
+        # nodes in the tree so far, for max_nodes
+        self.node_count = 1
+
+        # every node views the rows of one shared, integer-encoded training store
+        schema = copy.copy(self.attributes)
+        schema.append(self.classifier)
+        encoded = self.training_data.encode(schema)
+        # the attributes as they were trained on, for flattening and saving the tree
+        self.schema = copy.deepcopy(schema)
+
+        # bit i of an attribute mask stands for self.attributes[i]
+        self.attribute_bits = dict((attr.name, 1 << ndx) for ndx, attr in enumerate(self.attributes.attributes))
+
+        # workers are forked once the store exists, so they share it
+        self.pool = None
+        if jobs > 1 and not lazy:
+            _worker_store = encoded.store
+            self.pool = multiprocessing.Pool(processes=jobs)
 
         # initialize the beginning of the tree
-        root = Node(data=self.training_data, parent=None, children=list(), attribute=None)
-        self.id3(root=root, target_attribute=self.classifier, attrs=self.attributes, debug=False)
+        data = encoded.view(encoded.row_indices())
+        if bitsets is None:
+            bitsets = dataset.BitsetIndex.suits(schema)
+        if bitsets and self.pool is None and dataset.BitsetIndex.indexable(schema):
+            index = dataset.BitsetIndex(encoded.store)
+            rows = data.row_indices()
+            view = dataset.BitsetDataSet(index, index.bitset(rows) if len(rows) < index.size else None)
+            if len(view) == len(rows):
+                data = view
+        root = Node(data=data, parent=None, children=list(), attribute=None)
+        root.attrs = (1 << len(self.attributes)) - 1
+        if numeric:
+            # every numeric attribute is sorted once, the nodes below keep their part of the orders
+            root.data_set.presort(numeric)
+        build = self.id3_level_wise if level_wise else self.id3
+        if observer is not None:
+            observer.started(self)
+        try:
+            if not lazy:
+                build(root=root, target_attribute=self.classifier, attrs=root.attrs, debug=False)
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+                self.pool = None
+                _worker_store = None
         self.decision_tree = root
+        self.compiled_tree = None
+        if not lazy:
+            # the shared tables only describe the examples the tree was built from
+            self.statistics = None
+        if not incremental:
+            # the nodes only keep their class counts, so the training examples can be released
+            self.training_data = None
+        if observer is not None:
+            observer.finished(self)
+
+    def gains(self, data, target_attribute, candidates, debug=False):
+        """
+        The information gain of every candidate attribute of a node. Nodes that are large enough are spread across
+        the worker processes, a chunk of candidates each
+
+        :param data: (EncodedDataSet) the examples of the node
+        :param target_attribute: (Attribute) the attribute to classify based on
+        :param candidates: ([Attribute, ...]) the candidate attributes
+        :param debug: (boolean) Enables or disables debugging output
+        :return:
+        ([(Attribute, float), ...]) each attribute with its gain, in the order of candidates
+        """
+        if self.pool is None or len(candidates) < 2 or len(data) * len(candidates) < self.parallel_threshold:
+            return data.gains(target_attribute, candidates, debug)
+
+        # value lists travel with the task: the order they are summed in must be the current one
+        target = (target_attribute.name, list(target_attribute.values))
+        rows = array('I', data.row_indices()).tostring()
+        size = -(-len(candidates) // self.jobs)
+        chunks = [candidates[start:start + size] for start in range(0, len(candidates), size)]
+        tasks = [(target, [(attr.name, list(attr.values)) for attr in chunk], rows) for chunk in chunks]
+
+        result = list()
+        for chunk, gains in zip(chunks, self.pool.map(_evaluate_gains, tasks)):
+            for attr, gain in zip(chunk, gains):
+                if debug is True:
+                    print attr, ": ", gain
+                result.append((attr, gain))
+        return result
+
+    def update(self, new_examples, debug=False):
+        """
+        Adds training examples to a tree built with incremental=True, in the manner of ID5R: the examples are pushed
+        down the tree, adding to the class counts and count tables of every node they reach, and only the nodes whose
+        decision changed (a leaf that is no longer pure, a split with a different best attribute) are built again
+        from their examples. The tree is the one a full retrain on all the examples would build, unless max_nodes
+        limits it: the splits that are kept keep their nodes, and only the nodes left in the budget go to the subtrees
+        that are built again, where a retrain could have spent the budget elsewhere.
+
+        The new examples are stored with the training examples, so a training EncodedDataSet that views its whole
+        store sees them too. A view of the training store adds its rows as they are
+
+        :param new_examples: (DataSet) the examples to add
+        :param debug: (boolean) Enables or disables debugging output
+        """
+        if not self.incremental:
+            sys.stderr.write("error: only a tree built with incremental=True can be updated\n")
+            sys.exit(1)
+        self.expand_all()
+
+        target_attribute = self.classifier
+        root = self.decision_tree
+        store = root.data_set.store
+        if isinstance(new_examples, dataset.EncodedDataSet) and new_examples.store is store:
+            # rows of the training store that the tree was not trained on
+            rows = array('I', new_examples.row_indices())
+        else:
+            rows = store.add(new_examples)
+        if not len(rows):
+            return
+
+        # PUSH DOWN
+        # one level at a time, the new examples of every node they reach are counted in a single sweep
+        reached = set()
+        frontier = [(root, rows)]
+        while frontier:
+            counted = 0
+            for node, _ in frontier:
+                if node.split_counts is not None:
+                    counted |= node.attrs
+            statistics = dataset.contingencies([dataset.EncodedDataSet(store=store, rows=node_rows)
+                                                for _, node_rows in frontier],
+                                               target_attribute, self.candidates(counted))
+
+            next_frontier = list()
+            for (node, node_rows), (class_counts, tables) in zip(frontier, statistics):
+                reached.add(id(node))
+                for value, size in class_counts.items():
+                    node.class_counts[value] = node.class_counts.get(value, 0) + size
+                if node.split_counts is not None:
+                    for name, table in node.split_counts.items():
+                        for value, row in tables[name].items():
+                            counts = table.setdefault(value, dict())
+                            for label, size in row.items():
+                                counts[label] = counts.get(label, 0) + size
+                if node.pending is None:
+                    node.pending = array('I')
+                node.pending.extend(node_rows)
+
+                if 'end' in node.attribute.values:
+                    continue
+                children = dict(node.children)
+                new_data = dataset.EncodedDataSet(store=store, rows=node_rows)
+                for value, example_set in new_data.partition(node.attribute).items():
+                    if len(example_set):
+                        next_frontier.append((children[value], example_set.row_indices()))
+            frontier = next_frontier
+
+        if self.observer is not None:
+            self.observer.started(self)
+
+        # RESTRUCTURE
+        # nodes the new examples reached keep their decision if the counts still lead to it, and are built again
+        # otherwise. Below the nodes they did not reach, only the default classes can change
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if id(node) not in reached:
+                default_class = self.inherited_class(node)
+                if default_class != node.default_class:
+                    node.default_class = default_class
+                    if node.fallback:
+                        node.attribute = self.like_parent_like_child(classifier=target_attribute, node=node)
+                    stack.extend(child for _, child in node.children)
+                continue
+
+            node.default_class = self.inherited_class(node)
+            entropy, dominant_value = dataset.DataSet.counts_entropy(node.class_counts, target_attribute)
+            if 'end' in node.attribute.values:
+                keep = not node.fallback and entropy == 0 and dominant_value == node.attribute.name
+            else:
+                # the candidates the node was split from (a random draw of them under max_features)
+                gains = dataset.DataSet.table_gains(node.class_counts, node.split_counts, target_attribute,
+                                                    [attr for attr in self.candidates(node.attrs)
+                                                     if attr.name in node.split_counts], debug)
+                best_attribute = self.best_attribute(gains, debug)
+                gain = [gain for attr, gain in gains if attr is best_attribute][0]
+                # the node's children are already counted in self.node_count, max_nodes is not checked again
+                keep = (entropy != 0 and best_attribute.name == node.attribute.name and
+                        self.splittable(node, sum(node.class_counts.values()), new_children=False) and
+                        (self.min_gain is None or gain >= self.min_gain))
+
+            if keep:
+                stack.extend(child for _, child in node.children)
+                continue
+
+            if debug is True:
+                print 'rebuilding: ', node.attribute.name
+            # the subtree is replaced
+            self.node_count -= len(self.subtree(node)) - 1
+            node_rows = array('I', node.data_set.row_indices())
+            node_rows.extend(node.pending)
+            node.data_set = dataset.EncodedDataSet(store=store, rows=node_rows)
+            node.attribute = None
+            node.children = list()
+            node.fallback = False
+            node.split_counts = None
+            node.pending = None
+            self.id3(root=node, target_attribute=target_attribute, attrs=node.attrs, debug=debug)
+
+        self.compiled_tree = None
+        if self.observer is not None:
+            self.observer.finished(self)
+
+    def prune(self, validation_data):
+        """
+        Reduced-error pruning: every split that does not classify the validation examples that reach it better than
+        a leaf would becomes that leaf. The leaf predicts what the node would have if it had run out of features (see
+        majority_leaf).
+
+        The validation examples are routed through the tree once, counting the classes of the examples that reach
+        each node. Every prune is then decided bottom-up in a single pass, from those counts alone.
+
+        :param validation_data: (DataSet) examples held out of training
+        :return:
+        (int) the number of nodes removed
+        """
+        if self.decision_tree.class_counts is None:
+            sys.stderr.write("error: the tree has no training counts to prune with (was it loaded from a model?)\n")
+            sys.exit(1)
+        self.expand_all()
+        validation = self.compile().encode(validation_data)
+
+        # ROUTE
+        # the validation examples of every node, counted by class
+        counts = dict()
+        order = list()
+        stack = [(self.decision_tree, validation)]
+        while stack:
+            node, examples = stack.pop()
+            order.append(node)
+            counts[id(node)] = examples.class_counts(self.classifier)
+            if 'end' in node.attribute.values or not len(examples):
+                # the subtree of a node no example reaches has no examples anywhere
+                for child in self.subtree(node)[1:]:
+                    counts[id(child)] = dict()
+                    order.append(child)
+                continue
+            example_sets = examples.partition(node.attribute)
+            stack.extend((child, example_sets[value]) for value, child in node.children)
+
+        # PRUNE
+        # children come after their parents in order, so going through it backwards is bottom-up
+        correct = dict()
+        removed = 0
+        for node in reversed(order):
+            node_counts = counts[id(node)]
+            if 'end' in node.attribute.values:
+                correct[id(node)] = node_counts.get(node.attribute.name, 0)
+                continue
+
+            kept = sum(correct[id(child)] for _, child in node.children)
+            leaf, fallback = self.majority_leaf(node, self.classifier, node.class_counts)
+            collapsed = node_counts.get(leaf.name, 0)
+            if collapsed >= kept:
+                removed += len(self.subtree(node)) - 1
+                node.attribute = leaf
+                node.children = list()
+                node.fallback = fallback
+                node.split_counts = None
+                correct[id(node)] = collapsed
+            else:
+                correct[id(node)] = kept
+
+        self.node_count -= removed
+        self.compiled_tree = None
+        return removed
+
+    @staticmethod
+    def subtree(node):
+        """
+        :param node: (Node) a node of a tree
+        :return:
+        ([Node, ...]) the node and all of its descendants, parents before their children
+        """
+        nodes = [node]
+        for descendant in nodes:
+            nodes.extend(child for _, child in descendant.children)
+        return nodes
+
+    def compile(self):
+        """
+        Flattens the decision tree into arrays for batch classification. The result is cached until the tree changes
+
+        :return:
+        (CompiledTree) the flattened tree
+        """
+        self.expand_all()
+        if self.compiled_tree is None:
+            self.compiled_tree = CompiledTree.from_tree(self.decision_tree, self.schema, self.classifier.name)
+        return self.compiled_tree
+
+    def save(self, path):
+        """
+        Saves the trained tree in a compact binary file: the attributes and the flattened nodes, without any examples
+
+        :param path: (str) path of the file to write
+        """
+        with open(path, 'wb') as model_file:
+            self.compile().write(model_file)
+
+    @staticmethod
+    def load(path):
+        """
+        Loads a tree saved by save. The tree can be dumped and tested, but it has no training data
+
+        :param path: (str) path of the saved tree
+        :return:
+        (DTree) the tree
+        """
+        with open(path, 'rb') as model_file:
+            compiled = CompiledTree.read(model_file)
+
+        dtree = DTree.__new__(DTree)
+        dtree.schema = compiled.store.schema()
+        dtree.classifier = dtree.schema[compiled.classifier]
+        dtree.attributes = copy.copy(dtree.schema)
+        dtree.attributes.remove(dtree.classifier)
+        dtree.attribute_bits = dict((attr.name, 1 << ndx) for ndx, attr in enumerate(dtree.attributes.attributes))
+        dtree.training_data = None
+        dtree.jobs = 1
+        dtree.parallel_threshold = None
+        dtree.incremental = False
+        dtree.observer = None
+        dtree.max_depth = dtree.min_examples_split = dtree.min_gain = dtree.max_nodes = None
+        dtree.max_features = dtree.random = None
+        dtree.statistics = None
+        dtree.lazy = False
+        dtree.node_count = len(compiled)
+        dtree.pool = None
+        dtree.compiled_tree = compiled
+        dtree.decision_tree = compiled.to_tree(dtree.schema)
+        return dtree
+
+    def predict_batch(self, data):
+        """
+        Classifies a batch of examples by routing all of them through the flattened tree one level at a time
+
+        A lazy tree routes them through its nodes instead, expanding the nodes they reach that are not expanded yet
+
+        :param data: (DataSet) the examples to classify
+        :return:
+        ([str, ...]) the predicted class of each example, in order
+        """
+        if not self.lazy:
+            return self.compile().predict_batch(data)
+
+        encoded = data if isinstance(data, dataset.EncodedDataSet) else data.encode(self.schema)
+        store = encoded.store
+        codes = store.codes
+        rows = encoded.row_indices()
+        offsets = [row * store.width for row in rows]
+        predictions = [None] * len(offsets)
+        stack = [(self.decision_tree, range(len(offsets)))]
+        while stack:
+            node, positions = stack.pop()
+            if node.attribute is None:
+                self.expand(root=node, target_attribute=self.classifier, attrs=node.attrs)
+            if 'end' in node.attribute.values:
+                for ndx in positions:
+                    predictions[ndx] = node.attribute.name
+                continue
+            column = store.column(node.attribute)
+            values = store.values[column]
+            groups = dict()
+            if node.attribute.threshold is not None:
+                sides = node.attribute.values
+                threshold = node.attribute.threshold
+                numbers = store.numbers[column]
+                for ndx in positions:
+                    groups.setdefault(sides[numbers[rows[ndx]] > threshold], list()).append(ndx)
+            else:
+                for ndx in positions:
+                    groups.setdefault(values[codes[offsets[ndx] + column]], list()).append(ndx)
+            children = dict(node.children)
+            stack.extend((children[value], group) for value, group in groups.items())
+        return predictions
+
+    def expand_all(self):
+        """
+        Expands every node of a lazy tree that is not expanded yet, after which the tree is the same as if it had not
+        been lazy
+        """
+        if not self.lazy:
+            return
+        stack = [self.decision_tree]
+        while stack:
+            node = stack.pop()
+            if node.attribute is None:
+                self.id3(root=node, target_attribute=self.classifier, attrs=node.attrs)
+            else:
+                stack.extend(child for _, child in node.children)
+        self.lazy = False
+        self.statistics = None
 
     def test(self, classifier, testing_data, debug=False):
         """
@@ -60,8 +556,8 @@ class DTree:
             else:
                 return "!!!", 0
 
-        for example in testing_data.all_examples:
-            val1, val2 = self.test_case(instance=example, node=self.decision_tree), example.get_value(classifier)
+        predictions = self.predict_batch(testing_data)
+        for val1, val2 in zip(predictions, testing_data.values_of(classifier)):
             sign, add = warning(val1, val2)
             if debug is True:
                 print 'test: {}\tactual: {}\t{}'.format(val1, val2, sign)
@@ -79,7 +575,7 @@ class DTree:
 
     def pre_order(self, classifier, node, indent):
         """
-        Recursively create a string that visualizes the given tree in pre-order form
+        Create a string that visualizes the given tree in pre-order form (see write_dump)
 
         :param classifier: (Attribute):
         :param node: (Node):
@@ -87,133 +583,567 @@ class DTree:
         :return:
         (str) the text that has the visual output of the tree
         """
-        text = ''
-        if node.attribute.name in self.classifier.values:
-            text += "{}<{}>\n".format(str(' '*indent), node.attribute.name)
-            return text
-        else:
-            for child in node.children:
-                part = ''
-                part += "{}{}:{}\n".format(str(' ' * indent), node.attribute.name, child[0])
-                text += "{}{}".format(part, self.pre_order(classifier=classifier, node=child[1], indent=indent+1))
-        return text
+        text = StringIO()
+        self.write_dump(text, node, indent)
+        return text.getvalue()
+
+    def traverse(self, node=None):
+        """
+        Walks a tree in pre-order, children in the order of their values, without recursion
+
+        :param node: (Node) the node to start from, None for the root of the tree
+        :return:
+        (generator of (int, int, int, str, Node)) for every node: its number in the walk, the number of its parent
+                                                    (None for the first node), its depth below the first node, the
+                                                    value of its parent's attribute that leads to it, and the node
+        """
+        self.expand_all()
+        stack = [(None, 0, None, node if node is not None else self.decision_tree)]
+        number = 0
+        while stack:
+            parent, depth, value, node = stack.pop()
+            yield number, parent, depth, value, node
+            stack.extend((number, depth + 1, child_value, child) for child_value, child in reversed(node.children))
+            number += 1
+
+    def write_dump(self, out, node=None, indent=0):
+        """
+        Writes the dump of the tree to a file as the tree is walked, instead of building it as a string first
+
+        :param out: (file) the file to write to
+        :param node: (Node) the node to start from, None for the root of the tree
+        :param indent: (int) the indentation of the first node
+        """
+        write = out.write
+        for _, _, depth, value, node in self.traverse(node):
+            if value is not None:
+                write(' ' * (indent + depth - 1) + node.parent.attribute.name + ':' + value + '\n')
+            if 'end' in node.attribute.values:
+                write(' ' * (indent + depth) + '<' + node.attribute.name + '>\n')
+
+    def write_json_lines(self, out):
+        """
+        Writes the tree as JSON lines, one object per node in pre-order: {"id", "parent", "depth", "value" (of the
+        parent's attribute that leads to the node), "attribute" (the attribute the node splits on, null for a leaf),
+        "class" (the class a leaf predicts, null for a split), "fallback", "counts" (class counts of the training
+        examples, null for a loaded tree)}. Names and values are written as the bytes of the attributes file, as the
+        dump writes them, whatever their encoding
+
+        :param out: (file) the file to write to
+        """
+        for number, parent, depth, value, node in self.traverse():
+            leaf = 'end' in node.attribute.values
+            out.write(json.dumps({'id': number, 'parent': parent, 'depth': depth, 'value': value,
+                                  'attribute': None if leaf else node.attribute.name,
+                                  'class': node.attribute.name if leaf else None, 'fallback': node.fallback,
+                                  'counts': node.class_counts}, ensure_ascii=False))
+            out.write('\n')
+
+    def write_dot(self, out):
+        """
+        Writes the tree as a Graphviz DOT graph: splits are boxes, leaves are ellipses, and every edge is labelled with
+        the value that leads to the child. Names and values are written as the bytes of the attributes file, whatever
+        their encoding
+
+        :param out: (file) the file to write to
+        """
+        out.write('digraph {} {{\n'.format(_dot_string(self.classifier.name)))
+        for number, parent, _, value, node in self.traverse():
+            if 'end' in node.attribute.values:
+                out.write('  n{} [label={}, shape=ellipse];\n'.format(number, _dot_string(node.attribute.name)))
+            else:
+                out.write('  n{} [label={}, shape=box];\n'.format(number, _dot_string(node.attribute.name)))
+            if parent is not None:
+                out.write('  n{} -> n{} [label={}];\n'.format(parent, number, _dot_string(value)))
+        out.write('}\n')
+
+    def to_source(self, function_name='classify'):
+        """
+        Generates the source of a stand-alone Python module with a single function that classifies one example with
+        nested if statements mirroring the tree. The module needs neither this module nor the training data. The
+        subtrees more than SOURCE_MAX_DEPTH levels down are classified by helper functions of the module, so no
+        function nests too deep to compile.
+
+        The function takes a mapping from attribute name to value (Example.values for instance) and returns the
+        predicted class, or 'unknown' for a value the tree has no branch for.
+
+        :param function_name: (str) name of the generated function
+        :return:
+        (str) the source of the module
+        """
+        lines = ['"""',
+                 'Decision tree for {} generated by id3.DTree.to_source'.format(self.classifier.name),
+                 '"""',
+                 '',
+                 '',
+                 'def {}(example):'.format(function_name),
+                 '    """',
+                 '    :param example: (dict) attribute name -> value',
+                 '    :return:',
+                 '    (str) the predicted {}'.format(self.classifier.name),
+                 '    """']
+
+        self.expand_all()
+        # the stack holds lines that are ready to emit, and (node, depth) pairs that still need to be expanded
+        stack = [(self.decision_tree, 1)]
+        # (name, node) of the helper functions still to generate
+        helpers = list()
+        helper_count = 0
+        while stack or helpers:
+            if not stack:
+                name, node = helpers.pop(0)
+                lines.extend(['', '', 'def {}(example):'.format(name)])
+                stack.append((node, 1))
+            item = stack.pop()
+            if isinstance(item, str):
+                lines.append(item)
+                continue
+
+            node, depth = item
+            indent = '    ' * depth
+            if depth > SOURCE_MAX_DEPTH:
+                helper_count += 1
+                name = '_{}_{}'.format(function_name, helper_count)
+                lines.append('{}return {}(example)'.format(indent, name))
+                helpers.append((name, node))
+                continue
+            if 'end' in node.attribute.values:
+                lines.append('{}return {!r}'.format(indent, node.attribute.name))
+                continue
+
+            lines.append('{}value = example[{!r}]'.format(indent, node.attribute.name))
+            if node.attribute.threshold is not None:
+                (_, below), (_, above) = node.children
+                threshold = repr(node.attribute.threshold)
+                if math.isinf(node.attribute.threshold):
+                    # inf is not a literal
+                    threshold = 'float({!r})'.format(threshold)
+                stack.extend(reversed(['{}if float(value) <= {}:'.format(indent, threshold),
+                                       (below, depth + 1), '{}else:'.format(indent), (above, depth + 1)]))
+                continue
+            branches = list()
+            for ndx, (value, child) in enumerate(node.children):
+                branches.append('{}{} value == {!r}:'.format(indent, 'elif' if ndx else 'if', value))
+                branches.append((child, depth + 1))
+            branches.append("{}return 'unknown'".format(indent))
+            stack.extend(reversed(branches))
+
+        return '\n'.join(lines) + '\n'
+
+    def compile_function(self, function_name='classify'):
+        """
+        Compiles the source generated by to_source
+
+        :param function_name: (str) name of the generated function
+        :return:
+        (function) example values (dict) -> predicted class (str)
+        """
+        namespace = dict()
+        code = compile(self.to_source(function_name), '<decision tree for {}>'.format(self.classifier.name), 'exec')
+        exec code in namespace
+        return namespace[function_name]
+
+    def write_module(self, path, function_name='classify'):
+        """
+        Writes the source generated by to_source to a file, so it can be imported to score examples
+
+        :param path: (str) path of the .py file to write
+        :param function_name: (str) name of the generated function
+        """
+        with open(path, 'w') as module:
+            module.write(self.to_source(function_name))
 
     def test_case(self, instance, node):
         """
-        Recursively pass a given instance through the decision tree and return the answer
+        Pass a given instance down the decision tree, from the given node, and return the answer
 
         :param instance: (Example) the information to classify
         :param node: (Node) current node
         :return:
         (str) the trained classification for the given decision tree
         """
-        if 'end' in node.attribute.values:
-            return node.attribute.name
-        else:
+        while node is not None:
+            if node.attribute is None:
+                self.expand(root=node, target_attribute=self.classifier, attrs=node.attrs)
+            if 'end' in node.attribute.values:
+                return node.attribute.name
+
             example_value = instance.get_value(node.attribute)
+            if node.attribute.threshold is not None:
+                below, above = node.children
+                node = (below if float(example_value) <= node.attribute.threshold else above)[1]
+                continue
 
-            for child in node.children:
-                if example_value == child[0]:
-                    return self.test_case(instance=instance, node=child[1])
+            children = [child for value, child in node.children if example_value == value]
+            node = children[0] if children else None
 
         # the program should never get to this case
         # if it does then there is an issue either with the test code or the tree
         return 'unknown'
 
+    def majority_leaf(self, node, classifier, class_counts):
+        """
+        The leaf of a node that runs out of features: the dominant class of its examples, or like_parent_like_child
+        on a tie
+
+        :param node: (Node) the node
+        :param classifier: (Attribute) the attribute being classified
+        :param class_counts: (dict) class value -> number of the node's examples in that class
+        :return:
+        (Attribute, boolean) the leaf, and whether it falls back on the node's parents
+        """
+        num_pos = class_counts.get(classifier.values[0], 0)
+        num_neg = sum(class_counts.values()) - num_pos
+        tie = num_pos == num_neg
+
+        if tie:
+            # this is what we do in the event of a tie:
+            return self.like_parent_like_child(classifier=classifier, node=node), True
+        # in the event of NOT a tie
+        dominant_value = dataset.DataSet.counts_entropy(class_counts, classifier)[1]
+        return Attribute(dominant_value, ['end']), False
+
     @staticmethod
     def like_parent_like_child(classifier, node):
         """
         Use on a node that must rely on its parent for a classification
-        A function that keeps looking at its parents until the entropy of its parents is not
-        one
-
-        Then use the classification of that parent's entropy to figure out the child's entropy
+        The classification is that of the closest node, going up from the node itself through its parents, whose
+        entropy is not one: the default class of the node, resolved top-down from the class counts of the nodes
+        while the tree is built (see inherited_class). If there is none up to the root, the class that comes first in
+        the classifier's values
 
         :param classifier: (Attribute) the attribute for which to classify one's examples
         :param node: (Node) the node child that one wants to decide its classification
         :return:
         Attribute: return the attribute that this child should model based on their parent
         """
-        parent = node
-        while parent is not None:
+        if node.default_class is not None:
+            return Attribute(node.default_class, ['end'])
 
-            parent_entropy = parent.data_set.entropy(classifier=classifier)
-            if parent_entropy[0] != 1:
-                # there is an unequal amount of positive and negative value
-                # choose the most dominant value for the attribute
-                return Attribute(parent_entropy[1], 'end')
-            else:
-                # the data set is completely random
-                # meaning that there are equal amounts of positive classifications and negative
-                # classifications
-                # move to the next parent
-                parent = parent.parent
+        # every node up to the root is evenly split: the population is probably too small, and the class that comes
+        # earliest in the alphabet is chosen
+        return Attribute(classifier.values[0], ['end'])
 
-        else:
-            # finishes the loop correctly
-            # at the parent node
-            # Should not reach this area unless there is a perfect split in the examples
-            # which should not happen if you have good data
-            print 'error: finished the loop and there is no parent with a dominant value'
-            return Attribute(classifier.values.sort()[0], 'end')
+    def inherited_class(self, node):
+        """
+        The default class of a node (see like_parent_like_child): the dominant class of its examples, or the default
+        class of its parent if it has no examples or they are evenly distributed
+
+        :param node: (Node) a node with class counts, whose parent already has its default class
+        :return:
+        (str) the class, None if neither the node nor any of its parents has a dominant class
+        """
+        entropy, dominant_value = dataset.DataSet.counts_entropy(node.class_counts, self.classifier)
+        if entropy != 1 and dominant_value is not None:
+            return dominant_value
+        if node.parent is not None:
+            return node.parent.default_class
+        return None
 
     def id3(self, root, target_attribute, attrs, debug=False):
         """
-        Recursively build a decision tree that learns how to classify a given type of data
-        with a training set of data.
+        Build a decision tree that learns how to classify a given type of data
+        with a training set of data. The nodes are built depth first, each one before its children and its children in
+        order, from a stack rather than by recursion: numeric attributes can make a tree as deep as its examples allow.
 
         :param root: (Node) the current node that the algorithm is classifying
         :param target_attribute: (Attribute) the trait of the data that we would like to classify by
-        :param attrs: (Attributes) The Attributes that are related to this node's classification, excluding any
-                                    Attributes that have been used higher up the hierarchy
+        :param attrs: (int) Bitmask of the attributes that are related to this node's classification, excluding any
+                            attributes that have been used higher up the hierarchy (see self.attribute_bits)
         :param debug: (boolean) Enables or disables debugging output
         :return: void
         """
+        stack = [(root, attrs)]
+        while stack:
+            node, node_attrs = stack.pop()
+            # the first child is built next
+            stack.extend(reversed(self.expand(node, target_attribute, node_attrs, debug)))
+
+    def expand(self, root, target_attribute, attrs, debug=False):
+        """
+        Decides what one node becomes, from its examples, without building its children
+
+        :param root: (Node) the node to expand
+        :param target_attribute: (Attribute) the trait of the data that we would like to classify by
+        :param attrs: (int) Bitmask of the attributes still available to this node (see self.attribute_bits)
+        :param debug: (boolean) Enables or disables debugging output
+        :return:
+        ([(Node, int), ...]) the new children that still have to be built, with their bitmask of attributes (see grow)
+        """
+        class_counts = root.data_set.class_counts(target_attribute)
+        gains = None
+        gain_seconds = 0.0
+        if (attrs and dataset.DataSet.counts_entropy(class_counts, target_attribute)[0] != 0 and
+                self.splittable(root, sum(class_counts.values()))):
+            if self.observer is not None:
+                start = time.time()
+            # every categorical candidate is scored from one contingency table built in a single pass
+            candidates = self.split_candidates(attrs)
+            categorical = [attr for attr in candidates if not attr.numeric]
+            if self.statistics is not None or self.incremental:
+                if self.statistics is not None:
+                    class_counts, tables = self.statistics.contingency(self.path(root), categorical)
+                else:
+                    class_counts, tables = root.data_set.contingency(target_attribute, categorical)
+                if self.incremental:
+                    # keep the tables, new examples are added to them (see update)
+                    root.split_counts = tables
+                gains = dataset.DataSet.table_gains(class_counts, tables, target_attribute, categorical, debug)
+            else:
+                gains = self.gains(root.data_set, target_attribute, categorical, debug)
+            gains.extend(self.threshold_gains(root.data_set, target_attribute, candidates, debug))
+            if self.observer is not None:
+                gain_seconds = time.time() - start
+
+        return self.grow(root, target_attribute, attrs, class_counts, gains, debug, gain_seconds)
+
+    def id3_level_wise(self, root, target_attribute, attrs, debug=False):
+        """
+        Build the same decision tree as id3, breadth first: the nodes are expanded one level at a time, and the
+        statistics of every node of a level are counted in a single sweep over the training rows. An observer gets
+        each node's share of that sweep, in proportion to its number of examples, as part of its gain time
+
+        :param root: (Node) the root of the tree
+        :param target_attribute: (Attribute) the trait of the data that we would like to classify by
+        :param attrs: (int) Bitmask of the attributes to split on (see self.attribute_bits)
+        :param debug: (boolean) Enables or disables debugging output
+        :return: void
+        """
+        frontier = [(root, attrs)]
+        while frontier:
+            # only attributes that are a candidate somewhere on this level are counted
+            level_attrs = 0
+            for node, node_attrs in frontier:
+                if node_attrs and self.splittable(node, len(node.data_set)):
+                    level_attrs |= node_attrs
+            if self.observer is not None:
+                start = time.time()
+            level_candidates = [attr for attr in self.candidates(level_attrs) if not attr.numeric]
+            if self.statistics is not None:
+                # shared statistics are for categorical attributes only
+                statistics = [self.statistics.contingency(self.path(node), self.candidates(level_attrs & node_attrs))
+                              for node, node_attrs in frontier]
+            else:
+                statistics = dataset.contingencies([node.data_set for node, _ in frontier], target_attribute,
+                                                   level_candidates)
+            if self.observer is not None:
+                sweep_seconds = (time.time() - start) / max(1, sum(len(node.data_set) for node, _ in frontier))
+
+            next_frontier = list()
+            for (node, node_attrs), (class_counts, tables) in zip(frontier, statistics):
+                gains = None
+                gain_seconds = 0.0
+                if (node_attrs and dataset.DataSet.counts_entropy(class_counts, target_attribute)[0] != 0 and
+                        self.splittable(node, sum(class_counts.values()))):
+                    if self.observer is not None:
+                        start = time.time()
+                    candidates = self.split_candidates(node_attrs)
+                    categorical = [attr for attr in candidates if not attr.numeric]
+                    gains = dataset.DataSet.table_gains(class_counts, tables, target_attribute, categorical, debug)
+                    gains.extend(self.threshold_gains(node.data_set, target_attribute, candidates, debug))
+                    if self.incremental:
+                        node.split_counts = dict((attr.name, tables[attr.name]) for attr in candidates)
+                    if self.observer is not None:
+                        gain_seconds = time.time() - start + sweep_seconds * len(node.data_set)
+                next_frontier.extend(self.grow(node, target_attribute, node_attrs, class_counts, gains, debug,
+                                               gain_seconds))
+            frontier = next_frontier
+
+    @staticmethod
+    def threshold_gains(data, target_attribute, candidates, debug=False):
+        """
+        :param data: (EncodedDataSet) the examples of a node
+        :param target_attribute: (Attribute) the attribute to classify based on
+        :param candidates: ([Attribute, ...]) the candidate attributes, of which only the numeric ones are scored
+        :param debug: (boolean) Enables or disables debugging output
+        :return:
+        ([(Attribute, float), ...]) the best split of every numeric candidate that can be split, with its gain (see
+                                    EncodedDataSet.best_threshold)
+        """
+        result = list()
+        for attr in candidates:
+            if attr.numeric:
+                split = data.best_threshold(target_attribute, attr)
+                if split is not None:
+                    if debug is True:
+                        print split[0], ": ", split[1]
+                    result.append(split)
+        return result
+
+    def candidates(self, attrs):
+        """
+        :param attrs: (int) Bitmask of attributes (see self.attribute_bits)
+        :return:
+        ([Attribute, ...]) the attributes in the mask, in the order of self.attributes
+        """
+        return [attr for attr in self.attributes.attributes if attrs & self.attribute_bits[attr.name]]
+
+    def split_candidates(self, attrs):
+        """
+        :param attrs: (int) Bitmask of the attributes still available to a node (see self.attribute_bits)
+        :return:
+        ([Attribute, ...]) the attributes the node's split is chosen from: all of them, or max_features of them drawn
+                            at random, in the order of self.attributes
+        """
+        candidates = self.candidates(attrs)
+        if self.max_features is None or len(candidates) <= self.max_features:
+            return candidates
+        chosen = set(self.random.sample(range(len(candidates)), self.max_features))
+        return [attr for ndx, attr in enumerate(candidates) if ndx in chosen]
+
+    def splittable(self, node, examples, new_children=True):
+        """
+        :param node: (Node) a node that is neither pure nor out of features
+        :param examples: (int) number of examples of the node
+        :param new_children: (boolean) whether splitting the node adds children to the tree. The children of a split
+                                        that is kept (see update) are already counted, and max_nodes is not checked
+        :return:
+        (boolean) False if max_depth, min_examples_split or max_nodes keeps the node from splitting, whatever its
+                    best attribute
+        """
+        if self.min_examples_split is not None and examples < self.min_examples_split:
+            return False
+        if new_children and self.max_nodes is not None and self.node_count >= self.max_nodes:
+            return False
+        if self.max_depth is not None and self.depth(node) >= self.max_depth:
+            return False
+        return True
+
+    def worth_splitting(self, attribute, gain):
+        """
+        :param attribute: (Attribute) the best attribute of a node
+        :param gain: (float) its gain
+        :return:
+        (boolean) False if min_gain or max_nodes keeps the node from splitting on it
+        """
+        if self.min_gain is not None and gain < self.min_gain:
+            return False
+        if self.max_nodes is not None and self.node_count + len(attribute.values) > self.max_nodes:
+            return False
+        return True
+
+    @staticmethod
+    def best_attribute(gains, debug=False):
+        """
+        :param gains: ([(Attribute, float), ...]) the candidate attributes with their gains
+        :param debug: (boolean) Enables or disables debugging output
+        :return:
+        (Attribute) the attribute with the highest gain
+        """
+        # START: BEST ATTRIBUTE
+        best_attributes = list()
+
+        # find the best attribute
+        for attr, gain in gains:
+            if len(best_attributes) == 0:
+                best_attributes.append((attr, gain))
+            elif best_attributes[0][1] == gain:
+                best_attributes.append((attr, gain))
+            elif best_attributes[0][1] < gain:
+                best_attributes = [(attr, gain)]
+
+        # organize alphabetically
+        # "Also, if there is a tie in entropy reduction between multiple attributes, you should choose the
+        # attribute
+        # whose name is earlier in the alphabet (using Python's native string comparison)
+        def name(elem):
+            return elem[0].name
+
+        # sort based on name
+        best_attributes.sort(key=name)
+        if debug is True:
+            print
+            print 'best attributes: '
+            for attr in best_attributes:
+                print attr[0].name, " ",
+            print
+
+        return best_attributes[0][0]
+
+    @staticmethod
+    def path(node):
+        """
+        :param node: (Node) a node of a tree
+        :return:
+        (((str, str), ...)) the attribute name and value of every split from the root down to the node
+        """
+        path = list()
+        while node.parent is not None:
+            parent = node.parent
+            path.append((parent.attribute.name, [value for value, child in parent.children if child is node][0]))
+            node = parent
+        path.reverse()
+        return tuple(path)
+
+    @staticmethod
+    def depth(node):
+        """
+        :param node: (Node) a node of a tree
+        :return:
+        (int) the number of ancestors of the node
+        """
+        depth = 0
+        while node.parent is not None:
+            node = node.parent
+            depth += 1
+        return depth
+
+    def grow(self, root, target_attribute, attrs, class_counts, gains, debug=False, gain_seconds=0.0):
+        """
+        Decide what a node becomes: a leaf, or a split with one child per value of its best attribute
+
+        :param root: (Node) the current node that the algorithm is classifying
+        :param target_attribute: (Attribute) the trait of the data that we would like to classify by
+        :param attrs: (int) Bitmask of the attributes still available to this node (see self.attribute_bits)
+        :param class_counts: (dict) class value -> number of the node's examples in that class
+        :param gains: ([(Attribute, float), ...]) the gain of every available attribute, None if the node is pure
+                                                   or has no attributes left. Empty if no attribute can split the
+                                                   examples (every number of each numeric attribute is the same)
+        :param debug: (boolean) Enables or disables debugging output
+        :param gain_seconds: (float) time it took to evaluate the gains, reported to the observer
+        :return:
+        ([(Node, int), ...]) the new children that still have to be built, with their bitmask of attributes
+        """
+        observer = self.observer
+        if observer is not None:
+            depth = self.depth(root)
+            examples = sum(class_counts.values())
+            candidates = bin(attrs).count('1')
+
+        # the counts stay with the node: they decide the classification of empty children, and are updated
+        # along with the tree (see update)
+        root.class_counts = class_counts
+        root.attrs = attrs
+        root.default_class = self.inherited_class(root)
+        # the examples are no longer needed once the node is decided on, unless the tree is going to be updated
+        data_set = root.data_set
+        if not self.incremental:
+            root.data_set = None
+
         # pass in root
         # do a general check based on entropy
-        if root.data_set.entropy(classifier=target_attribute)[0] == 0:
-            value = root.data_set.all_examples[0].get_value(target_attribute)
-            root.attribute = Attribute(value, 'end')
-            return
+        entropy, dominant_value = dataset.DataSet.counts_entropy(class_counts, target_attribute)
+        if entropy == 0:
+            root.attribute = Attribute(dominant_value, ['end'])
+            if observer is not None:
+                observer.node(NodeEvent(depth, examples, candidates, gain_seconds, attribute=dominant_value,
+                                        leaf_reason=PURE))
+            return []
 
         # there are attributes to split upon
         # decide the split based on gain
-        if len(attrs) > 0:
-            # START: BEST ATTRIBUTE
-            best_attributes = list()
-
-            # find the best attribute
-            for attr in attrs:
-                # iterate through each value in the attribute
-                gain = root.data_set.gain(target_attribute, attr, debug)
-
-                if len(best_attributes) == 0:
-                    best_attributes.append((attr, gain))
-                elif best_attributes[0][1] == gain:
-                    best_attributes.append((attr, gain))
-                elif best_attributes[0][1] < gain:
-                    best_attributes = [(attr, gain)]
-
-            # organize alphabetically
-            # "Also, if there is a tie in entropy reduction between multiple attributes, you should choose the
-            # attribute
-            # whose name is earlier in the alphabet (using Python's native string comparison)
-            def name(elem):
-                return elem[0].name
-
-            # sort based on name
-            best_attributes.sort(key=name)
-            if debug is True:
-                print
-                print 'best attributes: '
-                for attr in best_attributes:
-                    print attr[0].name, " ",
-                print
+        best_attribute = None
+        if attrs and gains:
+            best_attribute = self.best_attribute(gains, debug)
+            gain = [gain for attr, gain in gains if attr is best_attribute][0]
+            if not self.worth_splitting(best_attribute, gain):
+                best_attribute = None
 
+        if best_attribute is not None:
             # BUILD CHILDREN
             # create the attribute for this node
-            root.attribute = best_attributes[0][0]
-            root.attribute.values.sort()  # alphabetically sort values
+            root.attribute = best_attribute
+            self.node_count += len(root.attribute.values)
 
             # END: BEST ATTRIBUTES
             if debug is True:
@@ -221,15 +1151,26 @@ class DTree:
                 raw_input('...')
 
             # ADD CHILDREN
+            # the children view ranges of the node's rows, regrouped in place by value
+            if observer is not None:
+                start = time.time()
+            example_sets = data_set.partition(root.attribute)
+            attributes = attrs
+            if root.attribute.threshold is None:
+                attributes &= ~self.attribute_bits[root.attribute.name]
+            if observer is not None:
+                observer.node(NodeEvent(depth, examples, candidates, gain_seconds, time.time() - start,
+                                        attribute=root.attribute.name, gain=gain))
+
+            to_build = list()
             for value in root.attribute.values:
-                example_set = [x for x in root.data_set.all_examples if x.get_value(root.attribute) == value]
+                example_set = example_sets[value]
 
                 # examples to work with
                 # make new node to pass down
-                next_node = Node(data=dataset.DataSet(), parent=root, children=list(), attribute=None)
-
-                attributes = copy.copy(attrs)
-                attributes.remove(root.attribute)
+                next_node = Node(data=example_set, parent=root, children=list(), attribute=None)
+                next_node.attrs = attributes
+                root.children.append((value, next_node))
 
                 # CASE: RUN OUT OF EXAMPLES
                 if len(example_set) == 0:
@@ -237,32 +1178,30 @@ class DTree:
                         print 'warning: out of examples'
                     # choose the most prevalent example from the population that falls into the parent's domain
                     parent = root
+                    next_node.class_counts = dict()
+                    next_node.default_class = root.default_class
+                    if not self.incremental:
+                        next_node.data_set = None
                     next_node.attribute = self.like_parent_like_child(classifier=target_attribute, node=parent)
+                    next_node.fallback = True
+                    if observer is not None:
+                        observer.node(NodeEvent(depth + 1, 0, candidates - 1, attribute=next_node.attribute.name,
+                                                leaf_reason=OUT_OF_EXAMPLES))
 
                     # no need to delve any more into next node
-                    root.children.append((value, next_node))
                     continue
 
-                # make a dataset with all the value-specific information and store in next node
-                next_node.data_set.all_examples = example_set
-                # update the children of the node by recursing through
-                self.id3(root=next_node, target_attribute=target_attribute, attrs=attributes, debug=debug)
-                root.children.append((value, next_node))
+                to_build.append((next_node, attributes))
+            return to_build
         else:
             # RUN OUT OF FEATURES
-            # no attributes
+            # no attributes (or none that splits the examples), or a limit stops the node from splitting
+            out_of_features = not attrs or gains == []
             if debug is True:
-                print 'warning: out of features'
-
-            num_pos = root.data_set.partial_count(target_attribute)
-            num_neg = len(root.data_set) - num_pos
-            tie = num_pos == num_neg
+                print 'warning: out of features' if out_of_features else 'warning: limit reached'
 
-            if tie:
-                # this is what we do in the event of a tie:
-                parent = root
-                root.attribute = self.like_parent_like_child(classifier=target_attribute, node=parent)
-            else:
-                # in the event of NOT a tie
-                dominant_value = root.data_set.entropy(classifier=target_attribute)[1]
-                root.attribute = Attribute(dominant_value, 'end')
+            root.attribute, root.fallback = self.majority_leaf(root, target_attribute, class_counts)
+            if observer is not None:
+                observer.node(NodeEvent(depth, examples, candidates, gain_seconds, attribute=root.attribute.name,
+                                        leaf_reason=OUT_OF_FEATURES if out_of_features else LIMITED))
+            return []
@@ -18,6 +18,8 @@ main-kfold.py
 
 import argparse
 import copy
+import inspect
+import multiprocessing
 import sys
 
 import attributes
@@ -43,7 +45,53 @@ parser.add_argument('--data',
 parser.add_argument('--k_value',
                     dest='k_value',
                     help='Number of partitions')
+parser.add_argument('--jobs',
+                    dest='jobs',
+                    type=int,
+                    default=1,
+                    help='Number of processes to run the folds in. Each fold builds its tree in one process, so '
+                         'bitsets still count its examples where they suit the attributes')
+parser.add_argument('--bad-rows',
+                    type=argparse.FileType('w'),
+                    dest='bad_rows_file',
+                    help='Skip invalid rows of the data file and report them in this file, instead of stopping')
+parser.add_argument('--cache-dir',
+                    dest='cache_dir',
+                    help='Keep a binary copy of each data file in this directory, and map it instead of parsing the '
+                         'file again while the file and the attributes are unchanged')
+parser.add_argument('--max-depth',
+                    dest='max_depth',
+                    type=int,
+                    help='Make nodes at this depth (the root is at depth 0) leaves')
+parser.add_argument('--min-examples-split',
+                    dest='min_examples_split',
+                    type=int,
+                    help='Make nodes with fewer examples than this leaves')
+parser.add_argument('--min-gain',
+                    dest='min_gain',
+                    type=float,
+                    help='Make nodes whose best split gains less than this leaves')
+parser.add_argument('--max-nodes',
+                    dest='max_nodes',
+                    type=int,
+                    help='Stop splitting nodes once the tree would have more nodes than this')
+parser.add_argument('--prune',
+                    dest='prune',
+                    action='store_true',
+                    help='Hold the next partition out of the training set of each fold, and prune the tree against it '
+                         '(reduced-error pruning)')
+parser.add_argument('--no-shared-statistics',
+                    dest='shared_statistics',
+                    action='store_false',
+                    help='Count the examples of every fold on its own, instead of counting each partition once for all '
+                         'the folds (the results are the same)')
 args = parser.parse_args()
+bad_rows = list() if args.bad_rows_file else None
+# limits are only passed on to the tree when they are asked for
+tree_options = dict()
+for limit in ('max_depth', 'min_examples_split', 'min_gain', 'max_nodes'):
+  if getattr(args, limit) is not None:
+    tree_options[limit] = getattr(args, limit)
 
 # Read in a complete list of attributes.
 # global all_attributes
@@ -62,19 +110,50 @@ else:
 
 
 # FUNCTION DEFINITIONS
-#  crawling internals
-def _generate_example(example_data):
+def _run_fold(fold):
     """
-    :param dir_list: str[] : a list of filepath information to distribute
-    :return: item : an indexed item from an iterable object
+    Trains a tree on every partition but one, and tests it on the remaining partition
 
-    description: a generator to distribute any information necessary
+    :param fold: (int) index of the partition to test on
+    :return: (float, object) : the accuracy of the tree (percentage), and the tree in compact form when running in a
+                                worker process (None otherwise)
+
+    description: the data set is inherited from the parent process, only the results travel back
     """
-    for example in example_data:
-        yield example
+    testing_partition = data_partition[fold]
+    validation_partition = data_partition[(fold + 1) % k_value] if args.prune else None
+    # the training set is a view of the rows of every other partition
+    members = [ndx for ndx, dset in enumerate(data_partition)
+               if dset is not testing_partition and dset is not validation_partition]
+    training_rows = list()
+    for ndx in members:
+        training_rows.extend(data_partition[ndx].row_indices())
+    train_set = data.view(training_rows)
+
+    # train the tree and gather the results
+    options = dict(tree_options)
+    if shared_statistics is not None:
+        options['statistics'] = shared_statistics.fold(members)
+    dtree = dtree_pkg.DTree(classifier, train_set, copy.copy(starting_attrs), **options)
+    if validation_partition is not None:
+        dtree.prune(validation_partition)
+
+    # test the tree
+    correct_results = dtree.test(classifier, testing_partition)
+    accuracy = (float(correct_results)*100.0)/float(len(testing_partition))
+
+    if multiprocessing.current_process().name == 'MainProcess':
+        return accuracy, dtree
+    return accuracy, dtree.compile() if hasattr(dtree, 'compile') else None
 
 # Train
-data = dataset.DataSet(args.data_file, all_attributes)
+if args.cache_dir:
+    data = dataset.load_cached(args.data_file, all_attributes, args.cache_dir, errors=bad_rows)
+else:
+    data = dataset.EncodedDataSet(args.data_file, all_attributes, errors=bad_rows)
+if bad_rows:
+    args.bad_rows_file.writelines(bad_rows)
+    sys.stderr.write("%d invalid rows skipped, see %s\n" % (len(bad_rows), args.bad_rows_file.name))
 starting_attrs = copy.copy(all_attributes)
 starting_attrs.remove(classifier)
 k_value = int(args.k_value)
@@ -82,40 +161,36 @@ if k_value <= 1:
     print 'warning: a partition of 1 or less will not work'
     print 'using k_value = 2'
     k_value = 2
+if args.prune and k_value < 3:
+  sys.stderr.write("--prune needs a k_value of at least 3\n")
+  sys.exit(1)
 
 # create K DATA SETS
-data_partition = list()
-for i in range(0, k_value):
-    data_partition.append(dataset.DataSet())
-
-# ROUND ROBIN ADD EXAMPLES
-example_generator = _generate_example(example_data=data.all_examples)  # generator for examples
-try:
-    while True:
-        for partition in data_partition:
-            partition.append(next(example_generator))
-except StopIteration:
-    # example distribution is complete
-    pass
+# ROUND ROBIN ADD EXAMPLES: partition i views rows i, i + k, i + 2k, ...
+all_rows = data.row_indices()
+data_partition = [data.view(all_rows[i::k_value]) for i in range(0, k_value)]
+
+# the training sets overlap, so every partition is counted once for all the folds and the folds add the counts up
+shared_statistics = None
+if (args.shared_statistics and 'statistics' in inspect.getargspec(dtree_pkg.DTree.__init__).args and
+        not any(attr.numeric for attr in starting_attrs.attributes)):
+    shared_statistics = dataset.PartitionStatistics(data_partition, classifier, starting_attrs)
+    # the root of every fold, counted before the workers are forked so they all inherit it
+    shared_statistics.count((), range(0, k_value))
 
 # K-FOLD PARTITIONING
-k_fold_forest = []  # a forest of d trees
-test_accuracy_sum = 0  # variable to hold the sum of each training and testing
-for testing_partition in data_partition:
-    # use the selected partition for the training set
-    # group all the other partitions into a testing set
-    training_dataset = [x for x in data_partition if x != testing_partition]
-    train_set = dataset.DataSet()
-
-    for dset in training_dataset:
-        train_set.all_examples.extend(dset.all_examples)
-
-    # train the tree and gather the results
-    k_fold_forest.append(dtree_pkg.DTree(classifier, train_set, copy.copy(starting_attrs)))
+if args.jobs > 1:
+    # the workers are forked after the data is loaded, so they share it instead of receiving a copy
+    pool = multiprocessing.Pool(processes=min(args.jobs, k_value))
+    fold_results = pool.map(_run_fold, range(0, k_value))
+    pool.close()
+    pool.join()
+else:
+    fold_results = [_run_fold(fold) for fold in range(0, k_value)]
 
-    # test the tree
-    correct_results = k_fold_forest[-1].test(classifier, testing_partition)
-    accuracy = (float(correct_results)*100.0)/float(len(testing_partition))
+k_fold_forest = [model for _, model in fold_results]  # a forest of d trees
+test_accuracy_sum = 0  # variable to hold the sum of each training and testing
+for accuracy, _ in fold_results:
     test_accuracy_sum += accuracy
 
 # DISPLAY AVERAGE
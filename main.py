@@ -13,6 +13,7 @@ import sys
 
 import attributes
 import dataset
+import observers
 
 parser = argparse.ArgumentParser(
            description='Train (and optionally test) a decision tree')
@@ -29,13 +30,66 @@ parser.add_argument('--attributes',
 parser.add_argument('--train',
                     type=argparse.FileType('r'),
                     help='Name of the file to use for training',
-                    dest='training_file',
-                    required=True)
+                    dest='training_file')
+parser.add_argument('--model',
+                    dest='model_file',
+                    help='Load a tree saved with --save-model instead of training one')
+parser.add_argument('--save-model',
+                    dest='save_model_file',
+                    help='Save the trained tree to this file')
 parser.add_argument('--test',
                     type=argparse.FileType('r'),
                     dest='testing_file',
                     help='Name of the file to use for testing')
+parser.add_argument('--bad-rows',
+                    type=argparse.FileType('w'),
+                    dest='bad_rows_file',
+                    help='Skip invalid rows of the data files and report them in this file, instead of stopping')
+parser.add_argument('--cache-dir',
+                    dest='cache_dir',
+                    help='Keep a binary copy of each data file in this directory, and map it instead of parsing the '
+                         'file again while the file and the attributes are unchanged')
+parser.add_argument('--max-depth',
+                    dest='max_depth',
+                    type=int,
+                    help='Make nodes at this depth (the root is at depth 0) leaves')
+parser.add_argument('--min-examples-split',
+                    dest='min_examples_split',
+                    type=int,
+                    help='Make nodes with fewer examples than this leaves')
+parser.add_argument('--min-gain',
+                    dest='min_gain',
+                    type=float,
+                    help='Make nodes whose best split gains less than this leaves')
+parser.add_argument('--max-nodes',
+                    dest='max_nodes',
+                    type=int,
+                    help='Stop splitting nodes once the tree would have more nodes than this')
+parser.add_argument('--prune',
+                    type=argparse.FileType('r'),
+                    dest='validation_file',
+                    help='Prune the trained tree against the examples of this file (reduced-error pruning)')
+parser.add_argument('--trace',
+                    type=argparse.FileType('w'),
+                    dest='trace_file',
+                    help='Write a JSON trace of every node built (examples, candidates, gain and partition time, '
+                         'outcome) to this file')
+parser.add_argument('--json-lines',
+                    type=argparse.FileType('w'),
+                    dest='json_lines_file',
+                    help='Also write the tree to this file as JSON lines, one object per node')
+parser.add_argument('--dot',
+                    type=argparse.FileType('w'),
+                    dest='dot_file',
+                    help='Also write the tree to this file as a Graphviz DOT graph')
+parser.add_argument('--module',
+                    dest='module_path',
+                    help='Also write the tree as a stand-alone Python module that classifies examples (see '
+                         'id3.DTree.to_source)')
 args = parser.parse_args()
+if not args.training_file and not args.model_file:
+  parser.error('one of --train or --model is required')
+bad_rows = list() if args.bad_rows_file else None
 
 # Read in a complete list of attributes.
 # global all_attributes
@@ -53,16 +107,62 @@ else:
   dtree_pkg = __import__(args.dtree_module)
 
 # Train
-training_data = dataset.DataSet(args.training_file, all_attributes)
-starting_attrs = copy.copy(all_attributes)
-starting_attrs.remove(classifier)
-dtree = dtree_pkg.DTree(classifier, training_data, starting_attrs)
-print dtree.dump()
+if args.model_file:
+  dtree = dtree_pkg.DTree.load(args.model_file)
+else:
+  if args.cache_dir:
+    training_data = dataset.load_cached(args.training_file, all_attributes, args.cache_dir, errors=bad_rows)
+  else:
+    training_data = dataset.EncodedDataSet(args.training_file, all_attributes, errors=bad_rows)
+  starting_attrs = copy.copy(all_attributes)
+  starting_attrs.remove(classifier)
+  # limits and instrumentation are only passed on when they are asked for
+  options = dict()
+  for limit in ('max_depth', 'min_examples_split', 'min_gain', 'max_nodes'):
+    if getattr(args, limit) is not None:
+      options[limit] = getattr(args, limit)
+  if args.trace_file:
+    options['observer'] = observers.TraceObserver()
+  dtree = dtree_pkg.DTree(classifier, training_data, starting_attrs, **options)
+  if args.trace_file:
+    options['observer'].write(args.trace_file)
+if args.validation_file:
+  if args.cache_dir:
+    validation_data = dataset.load_cached(args.validation_file, all_attributes, args.cache_dir, errors=bad_rows)
+  else:
+    validation_data = dataset.EncodedDataSet(args.validation_file, all_attributes, errors=bad_rows)
+  dtree.prune(validation_data)
+if args.save_model_file:
+  dtree.save(args.save_model_file)
+if hasattr(dtree, 'write_dump'):
+  # written as the tree is walked, the dump is never held in memory
+  dtree.write_dump(sys.stdout)
+  print
+else:
+  print dtree.dump()
+if args.json_lines_file:
+  dtree.write_json_lines(args.json_lines_file)
+if args.dot_file:
+  dtree.write_dot(args.dot_file)
+if args.module_path:
+  dtree.write_module(args.module_path)
 
 if args.testing_file:
-  testing_data = dataset.DataSet(args.testing_file, all_attributes)
-  correct_results = dtree.test(classifier, testing_data)
+  # the testing file is read and scored one batch at a time, unless it is mapped from the cache
+  if args.cache_dir:
+    testing_batches = [dataset.load_cached(args.testing_file, all_attributes, args.cache_dir, errors=bad_rows)]
+  else:
+    testing_batches = dataset.EncodedDataSet.stream(args.testing_file, all_attributes, errors=bad_rows)
+  correct_results = 0
+  testing_size = 0
+  for testing_data in testing_batches:
+    correct_results += dtree.test(classifier, testing_data)
+    testing_size += len(testing_data)
   print("%d of %d (%.2f%%) of testing examples correctly identified" %
-        (correct_results, len(testing_data),
-         (float(correct_results) * 100.0)/ float(len(testing_data))))
+        (correct_results, testing_size,
+         (float(correct_results) * 100.0)/ float(testing_size)))
+
+if bad_rows:
+  args.bad_rows_file.writelines(bad_rows)
+  sys.stderr.write("%d invalid rows skipped, see %s\n" % (len(bad_rows), args.bad_rows_file.name))
 
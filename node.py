@@ -14,14 +14,18 @@ will create a more friendly interface, but will
 """
 
 
-class Node:
+class Node(object):
     """Represents the nodes that make up the decision tree"""
 
+    __slots__ = ('attribute', 'data_set', 'parent', 'children', 'class_counts', 'attrs', 'fallback', 'split_counts',
+                 'pending', 'default_class')
+
     def __init__(self, data, parent, children, attribute=None):
         """
         Creates a new node
 
-        :param: data: (DataSet) the set of data associated with this node
+        :param: data: (DataSet) the set of data associated with this node, released once the tree is built unless
+                                the tree can be updated
         :param: classifier: (str) describe from which attribute are we classifying the information
         :param: parent: (Node) the reference to the node that self is attached to
         :param: children: ([Node, ...]) list of children nodes attached to self
@@ -41,9 +45,29 @@ class Node:
                                                         
                                                         EXAMPLE:
                                                         [ (value1, child1), (value2, child2), ... (valueN, <YES>) ]
+
+        self.class_counts (dict): number of examples of the node in each class, filled in while the tree is built
+
+        self.attrs (int): bitmask of the attributes that were still available to split this node on
+
+        self.fallback (bool): the node is a leaf whose classification was borrowed from its ancestors
+
+        self.default_class (str): the class the node falls back on, its own dominant class unless its classes are
+                                    tied, the default class of its parent otherwise
+
+        self.split_counts (dict): attribute name -> value -> class -> count for the attributes in self.attrs, only
+                                    kept by trees that can be updated (see DTree.update)
+
+        self.pending (array): rows added to the node by DTree.update that are not in self.data_set yet
         """
 
         self.attribute = attribute
         self.data_set = data
         self.parent = parent
         self.children = children
+        self.class_counts = None
+        self.attrs = 0
+        self.fallback = False
+        self.default_class = None
+        self.split_counts = None
+        self.pending = None
@@ -0,0 +1,150 @@
+"""
+File:           observers.py
+
+Description:
+Instrumentation of tree building. A DTree given an observer reports every node it decides on as a NodeEvent: how
+deep the node is, how many examples and candidate attributes it has, how long its gains and its partition took, and
+what it became (a split on an attribute, or a leaf and why). Without an observer nothing is timed or recorded.
+
+Observers that come with the tree:
+- CounterObserver adds the events up into counters
+- TraceObserver also keeps every event, and writes them out as a JSON trace
+"""
+
+import json
+import time
+
+# why a node became a leaf
+PURE = 'pure'
+OUT_OF_FEATURES = 'out of features'
+OUT_OF_EXAMPLES = 'out of examples'
+# stopped by one of the limits of the tree (max_depth, min_examples_split, min_gain, max_nodes)
+LIMITED = 'limited'
+
+
+class NodeEvent(object):
+    """What happened at one node of the tree"""
+
+    def __init__(self, depth, examples, candidates, gain_seconds=0.0, partition_seconds=0.0, attribute=None,
+                 gain=None, leaf_reason=None):
+        """
+        :param depth: (int) depth of the node, 0 for the root
+        :param examples: (int) number of training examples of the node
+        :param candidates: (int) number of attributes the node could still split on
+        :param gain_seconds: (float) time spent evaluating the gains of the candidates
+        :param partition_seconds: (float) time spent partitioning the examples among the children
+        :param attribute: (str) the attribute the node splits on, or the class it predicts if it is a leaf
+        :param gain: (float) the gain of the attribute the node splits on, None for a leaf
+        :param leaf_reason: (str) PURE, OUT_OF_FEATURES, OUT_OF_EXAMPLES or LIMITED for a leaf, None for a split
+        """
+        self.depth = depth
+        self.examples = examples
+        self.candidates = candidates
+        self.gain_seconds = gain_seconds
+        self.partition_seconds = partition_seconds
+        self.attribute = attribute
+        self.gain = gain
+        self.leaf_reason = leaf_reason
+
+    def as_dict(self):
+        """
+        :return:
+        (dict) the fields of the event
+        """
+        return {'depth': self.depth, 'examples': self.examples, 'candidates': self.candidates,
+                'gain_seconds': self.gain_seconds, 'partition_seconds': self.partition_seconds,
+                'attribute': self.attribute, 'gain': self.gain, 'leaf_reason': self.leaf_reason}
+
+
+class Observer(object):
+    """Receives the events of a tree being built. Every method does nothing unless overridden"""
+
+    def started(self, dtree):
+        """
+        Called before the tree starts building nodes (when it is created, and when it is updated)
+
+        :param dtree: (DTree) the tree
+        """
+        pass
+
+    def node(self, event):
+        """
+        Called once a node is decided on, before its children are built
+
+        :param event: (NodeEvent) what happened at the node
+        """
+        pass
+
+    def finished(self, dtree):
+        """
+        Called once the tree is built
+
+        :param dtree: (DTree) the tree
+        """
+        pass
+
+
+class CounterObserver(Observer):
+    """Adds up the events of one or more builds"""
+
+    def __init__(self):
+        self.nodes = 0
+        self.splits = 0
+        self.leaves = dict((reason, 0) for reason in (PURE, OUT_OF_FEATURES, OUT_OF_EXAMPLES, LIMITED))
+        self.examples = 0
+        self.max_depth = 0
+        self.gain_seconds = 0.0
+        self.partition_seconds = 0.0
+        self.build_seconds = 0.0
+        # attribute name -> number of nodes that split on it
+        self.split_attributes = dict()
+        self._start = None
+
+    def started(self, dtree):
+        self._start = time.time()
+
+    def node(self, event):
+        self.nodes += 1
+        self.examples += event.examples
+        self.max_depth = max(self.max_depth, event.depth)
+        self.gain_seconds += event.gain_seconds
+        self.partition_seconds += event.partition_seconds
+        if event.leaf_reason is None:
+            self.splits += 1
+            self.split_attributes[event.attribute] = self.split_attributes.get(event.attribute, 0) + 1
+        else:
+            self.leaves[event.leaf_reason] += 1
+
+    def finished(self, dtree):
+        self.build_seconds += time.time() - self._start
+
+    def summary(self):
+        """
+        :return:
+        (dict) the counters
+        """
+        return {'nodes': self.nodes, 'splits': self.splits, 'leaves': dict(self.leaves), 'examples': self.examples,
+                'max_depth': self.max_depth, 'gain_seconds': self.gain_seconds,
+                'partition_seconds': self.partition_seconds, 'build_seconds': self.build_seconds,
+                'split_attributes': dict(self.split_attributes)}
+
+
+class TraceObserver(CounterObserver):
+    """Keeps every event, in the order the nodes were decided on, along with the counters"""
+
+    def __init__(self):
+        CounterObserver.__init__(self)
+        self.events = list()
+
+    def node(self, event):
+        CounterObserver.node(self, event)
+        self.events.append(event.as_dict())
+
+    def write(self, trace_file):
+        """
+        Writes the trace as JSON: {"summary": the counters, "events": [every event, in order]}
+
+        :param trace_file: (file) the file to write to
+        """
+        json.dump({'summary': self.summary(), 'events': self.events}, trace_file, indent=1, sort_keys=True)
+        trace_file.write('\n')
@@ -51,6 +51,11 @@ do
   echo -n "TEST $TEST_NUM ($test_filename)..."
   TEST_NUM=$((TEST_NUM+1))
   test_out_filename="$RESULTS_DIR/${testname}.out"
+  # the tree is saved, and the saved model must load back to the same output. The tree's generated
+  # classifier module must compile
+  model_filename="$RESULTS_DIR/${testname}.model"
+  model_out_filename="$RESULTS_DIR/${testname}-model.out"
+  module_filename="$RESULTS_DIR/${testname}-tree.py"
   if [ -f "$test_data_filename" ]
   then
     python ./main.py id3 \
@@ -58,15 +63,60 @@ do
                      --attributes "$attr_filename" \
                      --train "$train_data_filename" \
                      --test "$test_data_filename" \
-           > $test_out_filename 2>&1
+                     --save-model "$model_filename" \
+                     --module "$module_filename" \
+           > $test_out_filename 2>&1 &&
+    python -m py_compile "$module_filename" >> $test_out_filename 2>&1 &&
+    python ./main.py id3 \
+                     "$classifier" \
+                     --attributes "$attr_filename" \
+                     --model "$model_filename" \
+                     --test "$test_data_filename" \
+           > $model_out_filename 2>&1
   else
     python ./main.py id3 \
                      "$classifier" \
                      --attributes "$attr_filename" \
                      --train "$train_data_filename" \
-           > $test_out_filename 2>&1
+                     --save-model "$model_filename" \
+                     --module "$module_filename" \
+           > $test_out_filename 2>&1 &&
+    python -m py_compile "$module_filename" >> $test_out_filename 2>&1 &&
+    python ./main.py id3 \
+                     "$classifier" \
+                     --attributes "$attr_filename" \
+                     --model "$model_filename" \
+           > $model_out_filename 2>&1
+  fi
+
+  if [ "$?" -ne '0' ]
+  then
+    echo "FAILED TO RUN"
+    RESULT_FAIL_TO_RUN=$((RESULT_FAIL_TO_RUN+1))
+    continue
   fi
 
+  if ! cmp -s "$test_out_filename" "$full_filename" || ! cmp -s "$model_out_filename" "$full_filename"
+  then
+    echo "FAIL"
+    RESULT_FAIL_TO_COMPARE=$((RESULT_FAIL_TO_COMPARE+1))
+    continue
+  fi
+
+  echo "PASS"
+  RESULT_PASS=$((RESULT_PASS+1))
+done
+
+# checks: scripts run from the top of the repository, whose output must match their .out file
+CHECK_DIR="$TEST_DIR/checks"
+for check_filename in `ls -1 $CHECK_DIR 2>/dev/null | grep '\.sh$' | sort`
+do
+  checkname=`basename $check_filename .sh`
+  echo -n "TEST $TEST_NUM (checks/$checkname)..."
+  TEST_NUM=$((TEST_NUM+1))
+  check_out_filename="$RESULTS_DIR/check-${checkname}.out"
+  bash "$CHECK_DIR/$check_filename" > $check_out_filename 2>&1
+
   if [ "$?" -ne '0' ]
   then
     echo "FAILED TO RUN"
@@ -74,7 +124,7 @@ do
     continue
   fi
 
-  if ! cmp -s "$test_out_filename" "$full_filename"
+  if ! cmp -s "$check_out_filename" "$CHECK_DIR/${checkname}.out"
   then
     echo "FAIL"
     RESULT_FAIL_TO_COMPARE=$((RESULT_FAIL_TO_COMPARE+1))
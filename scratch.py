@@ -124,7 +124,7 @@ class DTree:
             if parent_entropy[0] != 1:
                 # there is an unequal amount of positive and negative value
                 # choose the most dominant value for the attribute
-                return Attribute(parent_entropy[1], 'end')
+                return Attribute(parent_entropy[1], ['end'])
             else:
                 # the data set is completely random
                 # meaning that there are equal amounts of positive classifications and negative
@@ -137,7 +137,7 @@ class DTree:
             # at the parent node
             # SUSPICIOUS
             print 'error: finished the loop and there is no parent with a dominant value'
-            return Attribute(classifier.values.sort()[0], 'end')
+            return Attribute(classifier.values[0], ['end'])
 
     def id3(self, root, target_attribute, attrs, debug=False):
         """
@@ -152,7 +152,7 @@ class DTree:
         # do a general check based on entropy
         if root.data_set.entropy(classifier=target_attribute)[0] == 0:
             value = root.data_set.all_examples[0].get_value(target_attribute)
-            root.attribute = Attribute(value, 'end')
+            root.attribute = Attribute(value, ['end'])
             return
 
         # there are attributes to split upon
@@ -194,8 +194,6 @@ class DTree:
             # create the attribute for this node
             root.attribute = best_attributes[0][0]
 
-            root.attribute.values.sort()
-
             # END: BEST ATTRIBUTES
             if debug is True:
                 print "best attribute: ", root.attribute.name
@@ -249,4 +247,4 @@ class DTree:
             else:
                 # in the event of NOT a tie
                 dominant_value = root.data_set.entropy(classifier=target_attribute)[1]
-                root.attribute = Attribute(dominant_value, 'end')
+                root.attribute = Attribute(dominant_value, ['end'])
@@ -0,0 +1,398 @@
+#!/usr/bin/python
+"""
+File:           server.py
+
+Serves the predictions of a decision tree over a socket (TCP, or a Unix socket). The tree is loaded from a file saved
+with main.py --save-model, or trained when the server starts. Invoke with --help to see the complete list of options.
+
+Protocol: a client sends examples as lines in the format of the data files (the values of every attribute in the
+order of the attributes file, optionally with a "name:" label in front, the class value optional), and gets one line
+back for each of them, in order: the predicted class, or "error: " and why the example could not be classified.
+The line STATS gets the server's counters back as one line of JSON.
+
+Examples from all the connections are gathered into micro-batches: the first example of a batch waits at most
+--window-ms for others to join it, and the whole batch is routed through the compiled tree at once. Threads stand in
+for an event loop, which Python 2 does not have.
+"""
+
+import argparse
+import collections
+import copy
+import json
+import os
+import signal
+import socket
+import SocketServer
+import sys
+import threading
+import time
+import Queue
+
+import attributes
+import dataset
+import id3
+
+
+class Pending(object):
+    """An example waiting for its prediction"""
+
+    __slots__ = ('codes', 'error', 'result', 'start', 'done')
+
+    def __init__(self, codes, error):
+        """
+        :param codes: ([int or float, ...]) the codes of the example (see EncodedStore.encode_row)
+        :param error: (str) why the example could not be encoded, None if it is valid
+        """
+        self.codes = codes
+        self.error = error
+        self.result = None
+        self.start = time.time()
+        self.done = threading.Event()
+
+    def wait(self):
+        """
+        :return:
+        (str) the response line for the example, without the newline
+        """
+        self.done.wait()
+        return self.result
+
+
+class MicroBatcher(object):
+    """Gathers the examples submitted by any number of threads into batches, and classifies each batch at once"""
+
+    def __init__(self, tree, all_attributes, classifier, window=0.005, max_batch=1024):
+        """
+        :param tree: (CompiledTree) the tree to classify with
+        :param all_attributes: (Attributes) the attributes of the examples, in the order of the attributes file
+        :param classifier: (Attribute) the attribute being classified
+        :param window: (float) seconds the first example of a batch waits for more
+        :param max_batch: (int) largest number of examples in a batch
+        """
+        self.tree = tree
+        self.store = dataset.EncodedStore(all_attributes)
+        self.class_column = self.store.column(classifier)
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = Queue.Queue()
+        self.thread = None
+
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='micro-batcher')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def submit(self, line):
+        """
+        Queues one example for classification
+
+        :param line: (str) the example, as a line of a data file
+        :return:
+        (Pending) the example, to wait on for its prediction
+        """
+        values = line.rstrip().rpartition(':')[2].split(',')
+        if len(values) == self.store.width - 1:
+            # no class value: any valid one will do, it is not looked at
+            values.insert(self.class_column, self.store.values[self.class_column][0])
+        codes, error = self.store.encode_row(values, '<request>', self.requests + 1)
+        pending = Pending(codes, error)
+        if error is not None:
+            pending.result = 'error: ' + error.split(': ', 2)[-1].rstrip()
+            self.record([pending], 0)
+            pending.done.set()
+        else:
+            self.queue.put(pending)
+        return pending
+
+    def run(self):
+        """Body of the batching thread: classifies batches until stopped"""
+        while True:
+            pending = self.queue.get()
+            if pending is None:
+                return
+            batch = [pending]
+            deadline = time.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    break
+                try:
+                    pending = self.queue.get(timeout=timeout)
+                except Queue.Empty:
+                    break
+                if pending is None:
+                    self.queue.put(None)
+                    break
+                batch.append(pending)
+            self.classify(batch)
+
+    def classify(self, batch):
+        """
+        Answers every example of the batch, with "error: " and the reason if the batch could not be classified, so
+        that no client waits forever and the batching thread carries on
+
+        :param batch: ([Pending, ...]) valid examples
+        """
+        try:
+            store = self.store.empty()
+            for pending in batch:
+                store.append_row(pending.codes)
+            leaves = self.tree.predict_leaves(dataset.EncodedDataSet(store=store))
+            classes = self.tree.classes
+            label = self.tree.label
+            for pending, leaf in zip(batch, leaves):
+                pending.result = classes[label[leaf]]
+            self.record(batch, len(batch))
+        except Exception as error:
+            for pending in batch:
+                pending.result = 'error: %s: %s' % (type(error).__name__, error)
+            self.record(batch, 0)
+        for pending in batch:
+            pending.done.set()
+
+    def record(self, answered, batch_size):
+        """
+        :param answered: ([Pending, ...]) examples that got their response
+        :param batch_size: (int) size of the batch they were classified in, 0 for invalid examples
+        """
+        now = time.time()
+        with self.lock:
+            self.requests += len(answered)
+            if batch_size:
+                self.batches += 1
+                self.largest_batch = max(self.largest_batch, batch_size)
+            else:
+                self.errors += len(answered)
+            for pending in answered:
+                latency = now - pending.start
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+
+    def stats(self):
+        """
+        :return:
+        (dict) the counters: requests, errors, batches, mean and largest batch size, mean and largest latency
+        """
+        with self.lock:
+            classified = self.requests - self.errors
+            return {'requests': self.requests, 'errors': self.errors, 'batches': self.batches,
+                    'mean_batch_size': float(classified) / self.batches if self.batches else 0.0,
+                    'max_batch_size': self.largest_batch,
+                    'mean_latency_ms': 1000.0 * self.total_latency / self.requests if self.requests else 0.0,
+                    'max_latency_ms': 1000.0 * self.max_latency}
+
+
+class RequestHandler(SocketServer.StreamRequestHandler):
+    """
+    One connection. Its lines are submitted as they arrive, and a writer thread sends the responses back in order, so
+    a client may send many examples without waiting for each response
+    """
+
+    def handle(self):
+        batcher = self.server.batcher
+        responses = collections.deque()
+        ready = threading.Condition()
+        finished = [False]
+
+        def write():
+            while True:
+                with ready:
+                    while not responses and not finished[0]:
+                        ready.wait()
+                    if not responses:
+                        return
+                    response = responses.popleft()
+                line = response if isinstance(response, str) else response.wait()
+                try:
+                    self.wfile.write(line + '\n')
+                    self.wfile.flush()
+                except socket.error:
+                    return
+
+        writer = threading.Thread(target=write)
+        writer.daemon = True
+        writer.start()
+        for line in iter(self.rfile.readline, ''):
+            if not line.strip():
+                continue
+            if line.strip() == 'STATS':
+                response = json.dumps(batcher.stats(), sort_keys=True)
+            else:
+                response = batcher.submit(line)
+            with ready:
+                responses.append(response)
+                ready.notify()
+        with ready:
+            finished[0] = True
+            ready.notify()
+        writer.join()
+
+
+class TCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class UnixServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+def schema_mismatch(tree, all_attributes, classifier):
+    """
+    :param tree: (CompiledTree) a loaded tree
+    :param all_attributes: (Attributes) the attributes the examples will be sent with
+    :param classifier: (Attribute) the attribute being classified
+    :return:
+    (str) how the tree's schema differs from the attributes, None if the tree can classify their examples
+    """
+    if tree.classifier != classifier.name:
+        return "the model classifies '%s', not '%s'" % (tree.classifier, classifier.name)
+    schema = tree.store.schema()
+    names = set(schema.all_names())
+    for attr in all_attributes:
+        if attr.name not in names:
+            return "the model has no attribute '%s'" % attr.name
+        model_attr = schema[attr.name]
+        if model_attr.numeric != attr.numeric:
+            return "'%s' is %snumeric in the model" % (attr.name, '' if model_attr.numeric else 'not ')
+        if set(model_attr.values) != set(attr.values):
+            return "'%s' has the values %s in the model" % (attr.name, ', '.join(model_attr.values))
+    extra = sorted(names.difference(all_attributes.all_names()))
+    if extra:
+        return "the model has an attribute '%s' the attributes file does not" % extra[0]
+    return None
+
+
+def make_server(address, batcher):
+    """
+    :param address: ((str, int) or str) host and port to listen on (port 0 for any free port), or the path of a
+                                        Unix socket
+    :param batcher: (MicroBatcher) classifies the examples
+    :return:
+    (SocketServer.BaseServer) the server, bound and listening. Call serve_forever to answer requests
+    """
+    if isinstance(address, str):
+        server = UnixServer(address, RequestHandler)
+    else:
+        server = TCPServer(address, RequestHandler)
+    server.batcher = batcher
+    return server
+
+
+def classify(address, lines):
+    """
+    A client: classifies examples with a running server
+
+    :param address: ((str, int) or str) the address of the server (see make_server)
+    :param lines: ([str, ...]) the examples, as lines of a data file (or STATS)
+    :return:
+    ([str, ...]) the response to each line, in order
+    """
+    if isinstance(address, str):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    client.connect(address)
+    try:
+        client.sendall(''.join(line.rstrip('\n') + '\n' for line in lines))
+        client.shutdown(socket.SHUT_WR)
+        responses = client.makefile('r')
+        return [response.rstrip('\n') for response in responses]
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the predictions of a decision tree over a socket')
+    parser.add_argument('classifier',
+                        help='Name of the attribute to use for classification')
+    parser.add_argument('--attributes',
+                        type=argparse.FileType('r'),
+                        help='Name of the attribute specification file',
+                        dest='attributes_file',
+                        required=True)
+    parser.add_argument('--model',
+                        dest='model_file',
+                        help='Load a tree saved with main.py --save-model')
+    parser.add_argument('--train',
+                        type=argparse.FileType('r'),
+                        help='Train a tree on this file instead of loading one',
+                        dest='training_file')
+    parser.add_argument('--host',
+                        default='127.0.0.1',
+                        help='Address to listen on')
+    parser.add_argument('--port',
+                        type=int,
+                        default=0,
+                        help='TCP port to listen on, 0 for any free port')
+    parser.add_argument('--unix',
+                        dest='unix_socket',
+                        help='Listen on this Unix socket instead of TCP')
+    parser.add_argument('--window-ms',
+                        dest='window_ms',
+                        type=float,
+                        default=5.0,
+                        help='Milliseconds the first example of a batch waits for others')
+    parser.add_argument('--max-batch',
+                        dest='max_batch',
+                        type=int,
+                        default=1024,
+                        help='Largest number of examples in a batch')
+    args = parser.parse_args()
+    if not args.training_file and not args.model_file:
+        parser.error('one of --train or --model is required')
+
+    all_attributes = attributes.Attributes(args.attributes_file)
+    if args.classifier not in all_attributes.all_names():
+        sys.stderr.write("Classifier '%s' not a recognized attribute name\n" % args.classifier)
+        sys.exit(1)
+    classifier = all_attributes[args.classifier]
+
+    if args.model_file:
+        dtree = id3.DTree.load(args.model_file)
+        mismatch = schema_mismatch(dtree.compile(), all_attributes, classifier)
+        if mismatch is not None:
+            sys.stderr.write("%s does not match %s: %s\n" % (args.model_file, args.attributes_file.name, mismatch))
+            sys.exit(1)
+    else:
+        starting_attrs = copy.copy(all_attributes)
+        starting_attrs.remove(classifier)
+        dtree = id3.DTree(classifier, dataset.EncodedDataSet(args.training_file, all_attributes), starting_attrs)
+
+    batcher = MicroBatcher(dtree.compile(), all_attributes, classifier, args.window_ms / 1000.0, args.max_batch)
+    batcher.start()
+    if args.unix_socket:
+        if os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
+        server = make_server(args.unix_socket, batcher)
+        sys.stderr.write("listening on %s\n" % args.unix_socket)
+    else:
+        server = make_server((args.host, args.port), batcher)
+        sys.stderr.write("listening on %s:%d\n" % server.server_address)
+    # stopping the server the usual way still closes it, and removes its socket file
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.stop()
+        if args.unix_socket:
+            os.remove(args.unix_socket)
+
+
+if __name__ == '__main__':
+    main()
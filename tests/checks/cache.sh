@@ -0,0 +1,20 @@
+# Data files are mapped from their cache on the second load, whatever the encoding of their names and values
+python - <<'END'
+import shutil
+import tempfile
+from array import array
+
+import attributes
+import dataset
+
+cache_dir = tempfile.mkdtemp()
+try:
+    for name in ('desserts', 'desserts-latin1'):
+        all_attributes = attributes.Attributes(open('tests/%s-attributes.txt' % name))
+        for run in range(2):
+            data = dataset.load_cached(open('tests/%s-train.csv' % name), all_attributes, cache_dir)
+            print '%s: %s, %d examples, %r' % (name, 'parsed' if isinstance(data.store.codes, array) else 'mapped',
+                                               len(data), sorted(data[0].values.items()))
+finally:
+    shutil.rmtree(cache_dir)
+END
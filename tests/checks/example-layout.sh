@@ -0,0 +1,15 @@
+# Examples keep their columns when an attribute is removed from the Attributes they were read with
+python - <<'END'
+import attributes
+import dataset
+
+all_attributes = attributes.Attributes(open('tests/car-data-attributes.txt'))
+data = dataset.DataSet(open('tests/car-data-train.csv'), all_attributes)
+example = data[0]
+before = [example.get_value(attr) for attr in all_attributes.all_names()]
+all_attributes.remove('buying')
+after = [example.get_value(attr) for attr in ['buying'] + all_attributes.all_names()]
+print before
+print after
+print before == after
+END
@@ -0,0 +1,9 @@
+# The tree written as JSON lines and as a DOT graph, for a Latin-1 data set
+out=$(mktemp -d)
+python ./main.py id3 dessert \
+                 --attributes tests/desserts-latin1-attributes.txt \
+                 --train tests/desserts-latin1-train.csv \
+                 --json-lines "$out/tree.jsonl" \
+                 --dot "$out/tree.dot" > /dev/null || exit 1
+cat "$out/tree.jsonl" "$out/tree.dot"
+rm -r "$out"
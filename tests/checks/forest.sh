@@ -0,0 +1,28 @@
+# A forest trained in one process and one trained in several are the same for the same seed: same trees, same votes
+python - <<'END'
+import copy
+
+import attributes
+import dataset
+import forest
+
+for name, rows, max_features in (('car-data', None, 2), ('kr-vs-kp', None, None), ('numeric', 256, None)):
+    all_attributes = attributes.Attributes(open('tests/%s-attributes.txt' % name))
+    classifier = all_attributes[len(all_attributes.all_names()) - 1]
+    starting_attrs = copy.copy(all_attributes)
+    starting_attrs.remove(classifier)
+    training_data = dataset.EncodedDataSet(open('tests/%s-train.csv' % name), all_attributes)
+    if rows is not None:
+        training_data = training_data.view(range(rows))
+    testing_data = dataset.DataSet(open('tests/%s-test.csv' % name), all_attributes)
+
+    forests = [forest.Forest(classifier, training_data, starting_attrs, trees=6, max_features=max_features, jobs=jobs,
+                             seed=7) for jobs in (1, 3)]
+    same_trees = all([(a.split, a.label, a.first_child, a.children, a.threshold) ==
+                      (b.split, b.label, b.first_child, b.children, b.threshold)
+                      for a, b in zip(forests[0].trees, forests[1].trees)])
+    predictions = [trained.predict_batch(testing_data) for trained in forests]
+    print '%s: %d trees, same trees: %s, same votes: %s, %d of %d correct' % (
+        name, len(forests[0]), same_trees, predictions[0] == predictions[1],
+        forests[0].test(classifier, testing_data), len(testing_data))
+END
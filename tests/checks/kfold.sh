@@ -0,0 +1,39 @@
+# k-fold validation gives the same results whether the folds share the counts of the partitions or not
+for options in "--k_value 3" "--k_value 5 --max-depth 3" "--k_value 10" "--k_value 4 --prune"
+do
+  for test in car-data:quality:rand-total kr-vs-kp:white-can-win:train
+  do
+    IFS=: read name classifier data <<< "$test"
+    shared=$(python ./main-kfold.py id3 $classifier --attributes tests/$name-attributes.txt \
+                                    --data tests/$name-$data.csv $options) || exit 1
+    counted=$(python ./main-kfold.py id3 $classifier --attributes tests/$name-attributes.txt \
+                                     --data tests/$name-$data.csv $options --no-shared-statistics) || exit 1
+    echo "$name $options: $shared"
+    [ "$shared" = "$counted" ] || echo "  without shared statistics: $counted"
+  done
+done
+
+# the trees of every fold, not just their accuracy
+python - <<'END'
+import copy
+
+import attributes
+import dataset
+import id3
+
+all_attributes = attributes.Attributes(open('tests/car-data-attributes.txt'))
+classifier = all_attributes['quality']
+starting_attrs = copy.copy(all_attributes)
+starting_attrs.remove(classifier)
+data = dataset.EncodedDataSet(open('tests/car-data-rand-total.csv'), all_attributes)
+k_value = 5
+all_rows = data.row_indices()
+partitions = [data.view(all_rows[i::k_value]) for i in range(k_value)]
+shared = dataset.PartitionStatistics(partitions, classifier, starting_attrs)
+for fold in range(k_value):
+    members = [ndx for ndx in range(k_value) if ndx != fold]
+    train_set = data.view([row for ndx in members for row in partitions[ndx].row_indices()])
+    counted = id3.DTree(classifier, train_set, copy.copy(starting_attrs))
+    with_statistics = id3.DTree(classifier, train_set, copy.copy(starting_attrs), statistics=shared.fold(members))
+    print 'fold %d: %d nodes, same dump: %s' % (fold, counted.node_count, counted.dump() == with_statistics.dump())
+END
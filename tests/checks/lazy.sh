@@ -0,0 +1,30 @@
+# A lazy tree classifies like an eager one, expanding only the nodes its examples reach, and dumps the same once
+# expand_all has expanded the rest
+python - <<'END'
+import copy
+import os
+
+import attributes
+import dataset
+import id3
+
+for name, rows in (('car-data', None), ('kr-vs-kp', None), ('desserts', None), ('numeric', 256)):
+    all_attributes = attributes.Attributes(open('tests/%s-attributes.txt' % name))
+    classifier = all_attributes[len(all_attributes.all_names()) - 1]
+    starting_attrs = copy.copy(all_attributes)
+    starting_attrs.remove(classifier)
+    training_data = dataset.EncodedDataSet(open('tests/%s-train.csv' % name), all_attributes)
+    if rows is not None:
+        training_data = training_data.view(range(rows))
+
+    eager = id3.DTree(classifier, training_data, copy.copy(starting_attrs))
+    lazy = id3.DTree(classifier, training_data, copy.copy(starting_attrs), lazy=True)
+    same_predictions = None
+    if os.path.exists('tests/%s-test.csv' % name):
+        testing_data = dataset.DataSet(open('tests/%s-test.csv' % name), all_attributes)
+        same_predictions = lazy.predict_batch(testing_data) == eager.predict_batch(testing_data)
+    reached = len(lazy.subtree(lazy.decision_tree))
+    lazy.expand_all()
+    print '%s: %d nodes, %d in the lazy tree after the predictions, same predictions: %s, same dump: %s' % (
+        name, eager.node_count, reached, same_predictions, lazy.dump() == eager.dump())
+END
@@ -0,0 +1,18 @@
+# The generated classifier module of a tree whose thresholds are infinite compiles and classifies like the tree
+out=$(mktemp -d)
+printf 'x:numeric\nc:a,b\n' > "$out/attributes.txt"
+printf -- '-inf,a\n-inf,a\n1,b\n2,b\n3,a\ninf,b\ninf,b\n' > "$out/train.csv"
+printf -- '-inf,a\n0,b\n2.5,b\n1e308,a\ninf,b\n' > "$out/test.csv"
+python ./main.py id3 c --attributes "$out/attributes.txt" --train "$out/train.csv" --test "$out/test.csv" \
+                 --module "$out/tree.py" || exit 1
+python - "$out" <<'END'
+import sys
+
+sys.path.insert(0, sys.argv[1])
+import tree
+
+for line in open(sys.argv[1] + '/test.csv'):
+    x, c = line.strip().split(',')
+    print '%s -> %s' % (x, tree.classify({'x': x}))
+END
+rm -r "$out"
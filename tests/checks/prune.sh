@@ -0,0 +1,11 @@
+# Trees pruned against a validation file, with their accuracy on the test file
+python ./main.py id3 quality \
+                 --attributes tests/car-data-attributes.txt \
+                 --train tests/car-data-train.csv \
+                 --prune tests/car-data-test.csv \
+                 --test tests/car-data-test.csv || exit 1
+python ./main.py id3 dessert \
+                 --attributes tests/desserts-attributes.txt \
+                 --train tests/desserts-train.csv \
+                 --prune tests/desserts-test.csv \
+                 --test tests/desserts-test.csv
@@ -0,0 +1,47 @@
+# The server's answers to examples sent over a Unix socket, and the counters of its STATS that do not depend on timing
+serve() {
+  # serve <classifier> <attributes> <training data> <examples>
+  socket=$(mktemp -u)
+  python server.py "$1" --attributes "$2" --train "$3" --unix "$socket" 2> /dev/null &
+  server=$!
+  while [ ! -S "$socket" ]; do
+    kill -0 $server 2> /dev/null || exit 1
+    sleep 0.1
+  done
+  python - "$socket" "$4" <<'END'
+import json
+import sys
+
+import server
+
+socket, examples = sys.argv[1:]
+lines = open(examples).read().splitlines()
+for line, response in zip(lines, server.classify(socket, lines)):
+    print '%s -> %s' % (line, response)
+# once every example is answered
+stats = json.loads(server.classify(socket, ['STATS'])[0])
+print 'requests: %d, errors: %d' % (stats['requests'], stats['errors'])
+END
+  kill $server
+  wait $server
+}
+
+examples=$(mktemp)
+head -40 tests/car-data-test.csv > "$examples"
+cat >> "$examples" <<'END'
+vhigh,med,3,more,small,high
+plain:low,low,4,4,big,high
+low,low,4,4,huge,high,acc
+low,low
+END
+serve quality tests/car-data-attributes.txt tests/car-data-train.csv "$examples"
+
+training=$(mktemp)
+head -256 tests/numeric-train.csv > "$training"
+head -20 tests/numeric-test.csv > "$examples"
+cat >> "$examples" <<'END'
+-1e300
+12.5e
+END
+serve parity tests/numeric-attributes.txt "$training" "$examples"
+rm -f "$examples" "$training"
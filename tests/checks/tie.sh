@@ -0,0 +1,9 @@
+# Examples evenly split between the classes all the way up to the root get the class that comes earliest in the
+# alphabet, and nothing else is written
+out=$(mktemp -d)
+printf 'x:p,q\nc:yes,no\n' > "$out/attributes.txt"
+printf 'p,yes\np,no\nq,no\nq,yes\n' > "$out/train.csv"
+python ./main.py id3 c --attributes "$out/attributes.txt" --train "$out/train.csv"
+status=$?
+rm -r "$out"
+exit $status
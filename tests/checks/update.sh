@@ -0,0 +1,32 @@
+# A tree trained on part of a data set and updated with the rest, a batch at a time, dumps the same as a tree trained
+# on all of it at once
+python - <<'END'
+import copy
+
+import attributes
+import dataset
+import id3
+
+for name, parts in (('car-data', 4), ('kr-vs-kp', 5), ('desserts', 3), ('dangerous-animals', 3)):
+    all_attributes = attributes.Attributes(open('tests/%s-attributes.txt' % name))
+    classifier = all_attributes[len(all_attributes.all_names()) - 1]
+    starting_attrs = copy.copy(all_attributes)
+    starting_attrs.remove(classifier)
+    examples = dataset.DataSet(open('tests/%s-train.csv' % name), all_attributes).all_examples
+
+    size = len(examples) // parts + 1
+    first = dataset.DataSet()
+    first.all_examples = examples[:size]
+    updated = id3.DTree(classifier, first, copy.copy(starting_attrs), incremental=True)
+    updates = range(size, len(examples), size)
+    for start in updates:
+        batch = dataset.DataSet()
+        batch.all_examples = examples[start:start + size]
+        updated.update(batch)
+
+    whole = dataset.DataSet()
+    whole.all_examples = examples
+    fresh = id3.DTree(classifier, whole, copy.copy(starting_attrs))
+    print '%s: %d examples, %d updates, %d nodes, same dump: %s' % (
+        name, len(examples), len(updates), fresh.node_count, updated.dump() == fresh.dump())
+END